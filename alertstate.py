@@ -0,0 +1,106 @@
+#!/usr/bin/python3
+
+# APRS-NWS
+# Copyright 2021, Kurt Kochendarfer (KE7KUS)
+
+# ===GNU Public License v3===
+# This file is part of APRS-NWS.
+
+# APRS-NWS is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License 
+# as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+# APRS-NWS is distributed in the hope that it will be useful,but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License along with APRS-NWS.  If not, see <https://www.gnu.org/licenses/>.
+
+#-----IMPORTS-----#
+import os, json, datetime
+from collections import namedtuple
+
+#-----GLOBALS-----#
+STATE_PATH = '/tmp/wxalertstate.json'
+
+# Result of comparing one cycle's AlertRecords against the stored state.  new/updated/cancelled/unchanged hold AlertRecords; expired holds entry IDs.
+AlertDiff = namedtuple('AlertDiff', ['new', 'updated', 'cancelled', 'expired', 'unchanged'])
+
+def parseTime(dtg):
+    """Convert a CAP/ATOM DTG ('YYYY-MM-DDTHH:MM:SS+HH:MM') to an aware datetime.  Returns None if the DTG is missing or malformed."""
+    try:
+        return datetime.datetime.fromisoformat(dtg)
+    except (TypeError, ValueError):
+        return None
+
+def isExpired(expires, now):
+    """Return True if the cap:expires DTG lies in the past."""
+    end = parseTime(expires)
+    return end is not None and end <= now
+
+#-----CLASSES-----#
+class AlertState:
+    """Persistent record of the alerts already bulletined, keyed by atom entry ID and holding the atom:updated time and cap:expires DTG of each.  Used to emit bulletins only for alerts that changed since the last cycle."""
+    
+    def __init__(self, path=STATE_PATH):
+        """Initializes the state store, loading previously saved state from path so that a restart does not re-transmit every active alert."""
+        self.path = path
+        self.alerts = {}
+        
+        try:
+            if self.path and os.path.exists(self.path):
+                with open(self.path, 'r') as f:
+                    self.alerts = json.load(f)
+        
+        except Exception as ex:
+            print(f'AlertState Exception: {ex}')
+            self.alerts = {}
+    
+    def isExpired(self, expires, now):
+        """Return True if the cap:expires DTG lies in the past."""
+        return isExpired(expires, now)
+    
+    def diff(self, records, now=None):
+        """Compare a snapshot of AlertRecords to the stored state in a single pass.  Alerts with msgType Cancel are reported as cancelled; alerts that dropped out of the feed or whose expires time has passed are reported as expired."""
+        now = now or datetime.datetime.now(datetime.timezone.utc)
+        new, updated, cancelled, expired, unchanged = [], [], [], [], []
+        seen = set()
+        
+        for record in records:
+            seen.add(record.id)
+            known = self.alerts.get(record.id)
+            
+            if self.isExpired(record.expires, now):
+                if known is not None:
+                    expired.append(record.id)
+            elif known is not None and known[0] == record.updated:
+                unchanged.append(record)
+            elif record.msgType == 'Cancel':
+                cancelled.append(record)
+            elif known is None:
+                new.append(record)
+            else:
+                updated.append(record)
+        
+        expired.extend(i for i in self.alerts if i not in seen)
+        return AlertDiff(new, updated, cancelled, expired, unchanged)
+    
+    def apply(self, diff):
+        """Fold a diff into the stored state and save it.  Expired alerts are forgotten; everything else (including cancels, so they are only bulletined once) is remembered with its current updated time."""
+        for record in diff.new + diff.updated + diff.cancelled + diff.unchanged:
+            self.alerts[record.id] = [record.updated, record.expires]
+        for i in diff.expired:
+            self.alerts.pop(i, None)
+        self.save()
+    
+    def save(self):
+        """Write the state to disk atomically."""
+        if not self.path:
+            return
+        
+        try:
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(self.alerts, f)
+            os.replace(tmp, self.path)
+        
+        except Exception as ex:
+            print(f'AlertState save Exception: {ex}')
@@ -0,0 +1,129 @@
+#!/usr/bin/python3
+
+# APRS-NWS
+# Copyright 2021, Kurt Kochendarfer (KE7KUS)
+
+# ===GNU Public License v3===
+# This file is part of APRS-NWS.
+
+# APRS-NWS is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License 
+# as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+# APRS-NWS is distributed in the hope that it will be useful,but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License along with APRS-NWS.  If not, see <https://www.gnu.org/licenses/>.
+
+
+#-----IMPORTS-----#
+import time, heapq
+from alertstate import parseTime
+
+#-----GLOBALS-----#
+REBEACON_INTERVAL = 1800    # Seconds between re-beacons of a still-active alert.  0 disables re-beacons.
+
+#-----CLASSES-----#
+class StoredAlert:
+    """One tracked alert: the AlertRecord it was last bulletined from, its cap:expires time as a timestamp (None if unknown), the packets queued for it, its scheduler priority penalty, and a version number that tells live heap entries from superseded ones."""
+    __slots__ = ('record', 'expires', 'packets', 'penalty', 'version')
+    
+    def __init__(self, record, expires, packets, penalty, version):
+        self.record = record
+        self.expires = expires
+        self.packets = packets
+        self.penalty = penalty
+        self.version = version
+
+class AlertStore:
+    """In-memory alert lifecycle store.  Maps each alert's entry ID to the packets last queued for it, so an Update or Cancel can purge the superseded packets still waiting in the spool or scheduler.  Expiry and re-beacons are driven from two min-heaps keyed on time, so each cycle only touches the alerts that are due instead of rescanning every alert.  Heap entries left behind by an update are skipped lazily by version.  A Cancel that expires or leaves the feed keeps its packets queued until a newer message supersedes them, so the cancellation itself still goes out."""
+    
+    def __init__(self, rebeacon=REBEACON_INTERVAL, clock=time.time):
+        """Initializes an empty store.  rebeacon is the re-beacon interval in seconds (0 disables); clock returns the current time as a timestamp."""
+        self.rebeacon = rebeacon
+        self.clock = clock
+        self.alerts = {}
+        self.expiry = []        # (expires, version, id)
+        self.beacons = []       # (due, version, id)
+        self.cancels = {}       # id -> packets of retired Cancels that may still be queued
+        self.version = 0
+    
+    def __len__(self):
+        return len(self.alerts)
+    
+    def __contains__(self, id):
+        return id in self.alerts
+    
+    def isCurrent(self, id, version):
+        """Return True if a heap entry still refers to the live version of an alert."""
+        alert = self.alerts.get(id)
+        return alert is not None and alert.version == version
+    
+    def track(self, record, packets, penalty=0, now=None):
+        """Record the packets just queued for an alert and schedule its expiry and next re-beacon (cancels are not re-beaconed).  Returns the packets of the version it supersedes, and of any earlier alerts it references, which should be purged from the queues."""
+        now = now or self.clock()
+        old = self.alerts.get(record.id)
+        superseded = list(old.packets) if old is not None else []
+        superseded.extend(self.cancels.pop(record.id, ()))
+        for ref in record.references:
+            if ref != record.id:
+                superseded.extend(self.forget(ref))
+        end = parseTime(record.expires)
+        end = end.timestamp() if end is not None else None
+        
+        self.version += 1
+        self.alerts[record.id] = StoredAlert(record, end, tuple(packets), penalty, self.version)
+        if end is not None:
+            heapq.heappush(self.expiry, (end, self.version, record.id))
+        if self.rebeacon and record.msgType != 'Cancel':
+            heapq.heappush(self.beacons, (now + self.rebeacon, self.version, record.id))
+        return superseded
+    
+    def forget(self, id):
+        """Stop tracking an alert (including a retired Cancel) that a newer message supersedes.  Returns its queued packets, which should be purged."""
+        alert = self.alerts.pop(id, None)
+        return (alert.packets if alert is not None else ()) + tuple(self.cancels.pop(id, ()))
+    
+    def retire(self, id):
+        """Stop tracking an alert that expired or dropped out of the feed.  Returns its queued packets, which should be purged, except for a Cancel: its packets are kept in self.cancels until superseded."""
+        alert = self.alerts.pop(id, None)
+        if alert is None:
+            return ()
+        if alert.record.msgType == 'Cancel':
+            self.cancels[id] = alert.packets
+            return ()
+        return alert.packets
+    
+    def prune(self, isWaiting):
+        """Drop retired Cancels none of whose packets are still waiting, as reported by isWaiting(packets).  Returns the number dropped."""
+        done = [id for id, packets in self.cancels.items() if not isWaiting(packets)]
+        for id in done:
+            del self.cancels[id]
+        return len(done)
+    
+    def expire(self, now=None):
+        """Retire every alert whose expiry time has passed.  Returns (ids, packets) of the expired alerts; a Cancel's packets are not included."""
+        now = now or self.clock()
+        ids, packets = [], []
+        
+        while self.expiry and self.expiry[0][0] <= now:
+            end, version, id = heapq.heappop(self.expiry)
+            if self.isCurrent(id, version):
+                ids.append(id)
+                packets.extend(self.retire(id))
+        return ids, packets
+    
+    def dueBeacons(self, now=None):
+        """Return (AlertRecord, packets, penalty) for every still-active alert whose re-beacon is due, and schedule its next one."""
+        now = now or self.clock()
+        due = []
+        
+        while self.beacons and self.beacons[0][0] <= now:
+            when, version, id = heapq.heappop(self.beacons)
+            if not self.isCurrent(id, version):
+                continue
+            alert = self.alerts[id]
+            if alert.expires is not None and alert.expires <= now:
+                continue
+            due.append((alert.record, alert.packets, alert.penalty))
+            heapq.heappush(self.beacons, (now + self.rebeacon, version, id))
+        return due
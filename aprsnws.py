@@ -15,33 +15,442 @@
 # You should have received a copy of the GNU General Public License along with APRS-NWS.  If not, see <https://www.gnu.org/licenses/>.
 
 #-----IMPORTS-----#
-import time, datetime, requests, os, sys
+import time, datetime, requests, os, sys, threading, signal, random, argparse
+from email.utils import parsedate_to_datetime
 import lxml.etree as et
 from io import BytesIO
-import nm, cap
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+import cap, zones, bulletin, scheduler, feedcache, alertstate, alertstore, spool, metrics, sinks, nwsapi
 
 # TODO: Automate import/install of dependency libraries via pip
 
 #-----GLOBALS-----#
 LOCALE = ('nm')
+LOCALES = (LOCALE,)     # All locales polled each cycle by AlertPoller, e.g. ('nm', 'az', 'co', 'tx') for a border region.
+FEED_URL = 'https://alerts.weather.gov/cap/{locale}.php?x=0'
+FEED_ADAPTER = 'atom'   # 'atom' for the CAP ATOM feeds at FEED_URL, 'geojson' for the api.weather.gov alerts API at API_URL.
+API_URL = nwsapi.API_URL
+API_FILTERS = {'status': 'actual'}      # Server-side filters for the GeoJSON API, e.g. {'severity': ['Extreme', 'Severe']}.  LOCALES become area (or zone) filters.
+FETCH_TIMEOUT = 30      # Per-locale request timeout in seconds.
+STREAM_FEED = False     # Parse ATOM feeds incrementally, keeping only ZONE_PREFIXES, e.g. LOCALES = ('us',) with ZONE_PREFIXES = ('NM', 'AZ').  Still uses the feed cache's conditional GET.
+ZONE_PREFIXES = ()      # State/zone prefixes kept by the streaming parser (and the GeoJSON adapter), e.g. ('NM', 'AZZ5').  Empty keeps everything.
+PACK_ZONES = False      # Pack each alert's zones into as few packets as possible (UGC range notation) instead of one packet per zone.
+POLL_INTERVAL = 120     # Seconds between polls.  Unchanged feeds cost a 304 (or a hash compare) and no parsing/formatting.
+MIN_INTERVAL = 60       # Poll interval while any active alert is Extreme/Severe or Immediate.
+MAX_INTERVAL = 1800     # Longest interval reached by backing off while feeds are empty or unchanged.
+BACKOFF_FACTOR = 2
+JITTER = 0.1            # +/- fraction of each interval, so multiple instances do not poll in lock step.
+REBEACON_INTERVAL = alertstore.REBEACON_INTERVAL    # Seconds between re-beacons of still-active alerts.  0 disables re-beacons.
+METRICS_ENABLED = False # Collect pipeline metrics; written to metrics.STATS_PATH each cycle.
+METRICS_PORT = None     # If set, also serve the metrics at http://127.0.0.1:<port>/metrics.
+CALLSIGN = 'N0CALL'     # Source callsign(-SSID) for packets sent directly to APRS-IS or a KISS TNC.
+PASSCODE = '-1'         # APRS-IS passcode for CALLSIGN.
+APRSIS_SERVER = None    # e.g. 'noam.aprs2.net' to send bulletins straight to APRS-IS.
+APRSIS_FILTER = None
+KISS_SERVER = None      # e.g. '127.0.0.1' to send bulletins to a Direwolf (or other) KISS TCP port.
+KISS_PORT = 8001
+SPOOL_ENABLED = True    # Queue bulletins in the AlertSpool for aprx (aprxfeeder.py).  Disable when only APRS-IS/KISS sinks are used.
+GEOFENCE_STATION = None         # (lat, lon) of the digipeater, e.g. (35.08, -106.65).  Alerts whose polygon misses the footprint are filtered.
+GEOFENCE_RADIUS_KM = 150
+GEOFENCE_POLYGON = None         # Alternatively, a coverage polygon in CAP syntax ('lat,lon lat,lon ...').
+GEOFENCE_MODE = 'suppress'      # 'suppress' drops alerts outside the footprint; 'deprioritize' sends them after everything else.
 t = None
+FETCH_COUNT = 0     # Number of feed downloads made by getAlerts since startup.  Used to verify one network request per cycle.
+_fetch_lock = threading.Lock()
+RETRY_AFTER = {}        # Locale -> seconds requested by the server's last Retry-After header.
 
-#TODO: Modify getAlerts to handle multiple locales
+NS = {"atom":"http://www.w3.org/2005/Atom",
+      "cap":"urn:oasis:names:tc:emergency:cap:1.1",
+      "ha":"http://www.alerting.net/namespace/index_1.0"
+     }
 
-def getAlerts(locale):
-    """Gets alerts for the locale designated at XMLHandler class instatiation."""
+UGC_PATH = et.XPath('cap:geocode/atom:value[2]/text()', namespaces=NS)   # Compiled once; evaluated for every entry.
+
+# Compact record holding every field the bulletin pipeline needs from one atom:entry.
+# references holds the IDs of earlier alerts an Update/Cancel supersedes (GeoJSON feeds only; the ATOM entries do not carry them).
+AlertRecord = namedtuple('AlertRecord', ['id', 'published', 'updated', 'event', 'status', 'msgType', 'severity', 'certainty',
+                                         'urgency', 'category', 'effective', 'expires', 'polygon', 'areaDesc', 'geocodes', 'references'],
+                         defaults=((),))
+
+def makeFeedUrl(locale, url=FEED_URL):
+    """Build the ATOM feed URL for a locale.  The url template may be overridden to point at a mirror or local test server."""
+    return url.format(locale=locale)
+
+def countFetch():
+    """Increment the global feed download counter.  Thread-safe so concurrent pollers report accurate request counts."""
+    global FETCH_COUNT
+    
+    with _fetch_lock:
+        FETCH_COUNT += 1
+
+def getRetryAfter(response):
+    """Return the delay in seconds requested by a response's Retry-After header (delta-seconds or HTTP-date), or None."""
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    
     try:
-        newsfeed = ('https://alerts.weather.gov/cap/' + str(locale) + '.php?x=0')
-        r = requests.get(newsfeed)
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+        return max((when - datetime.datetime.now(datetime.timezone.utc)).total_seconds(), 0)
+    except (TypeError, ValueError):
+        return None
+
+def checkResponse(locale, response):
+    """Record any Retry-After requested by a throttled (429/503) response, then raise for HTTP errors."""
+    if response.status_code in (429, 503):
+        delay = getRetryAfter(response)
+        if delay is not None:
+            with _fetch_lock:
+                RETRY_AFTER[locale] = delay
+    response.raise_for_status()
+
+def getAlerts(locale, session=None, timeout=None, url=FEED_URL):
+    """Gets alerts for the locale designated at XMLHandler class instatiation.  An optional requests.Session allows connection reuse between calls."""
+    try:
+        newsfeed = makeFeedUrl(locale, url)
+        countFetch()
+        with metrics.METRICS.timer('aprsnws_fetch_seconds', locale=locale):
+            r = (session or requests).get(newsfeed, timeout=timeout)
+        checkResponse(locale, r)
         b = BytesIO(r.content)
-        t = et.parse(b)
+        with metrics.METRICS.timer('aprsnws_stage_seconds', stage='parse'):
+            t = et.parse(b)
         root = t.getroot()
         return t
 
     except Exception as ex:
+        metrics.METRICS.inc('aprsnws_errors_total', stage='fetch', locale=locale)
         print(f'getAlerts Exception: {ex}')
 
+def makeAlertRecord(entry, ns=NS):
+    """Convert a single atom:entry element into an AlertRecord.  Missing elements are returned as empty strings; the UGC geocode list (second cap:geocode value) is split into a tuple of zone/county codes."""
+    
+    def text(path):
+        return (entry.findtext(path, default='', namespaces=ns) or '').strip()
+    
+    ugc = UGC_PATH(entry) if ns is NS else entry.xpath('cap:geocode/atom:value[2]/text()', namespaces=ns)
+    return AlertRecord(id=text('atom:id'),
+                       published=text('atom:published'),
+                       updated=text('atom:updated'),
+                       event=text('cap:event'),
+                       status=text('cap:status'),
+                       msgType=text('cap:msgType'),
+                       severity=text('cap:severity'),
+                       certainty=text('cap:certainty'),
+                       urgency=text('cap:urgency'),
+                       category=text('cap:category'),
+                       effective=text('cap:effective'),
+                       expires=text('cap:expires'),
+                       polygon=text('cap:polygon'),
+                       areaDesc=text('cap:areaDesc'),
+                       geocodes=tuple(ugc[0].split()) if ugc else ())
+
+def parseSnapshot(tree, ns=NS):
+    """Turn a parsed ATOM feed into a tuple of AlertRecords in a single pass over the atom:entry elements.  Returns an empty tuple if the feed could not be retrieved."""
+    if tree is None:
+        return ()
+    
+    root = tree.getroot() if hasattr(tree, 'getroot') else tree
+    return tuple(makeAlertRecord(entry, ns) for entry in root.iterfind('atom:entry', namespaces=ns))
+
+def matchZones(record, prefixes):
+    """Return record with its geocodes trimmed to those starting with one of prefixes, or None if no geocode matches.  An empty prefix list matches everything."""
+    if not prefixes:
+        return record
+    
+    matched = tuple(z for z in record.geocodes if z.startswith(prefixes))
+    return record._replace(geocodes=matched) if matched else None
+
+def iterAlertRecords(source, prefixes=(), ns=NS):
+    """Incrementally parse an ATOM feed from a file path or file-like object, yielding one AlertRecord per atom:entry.  Each entry is cleared (along with its already-processed siblings) once converted, so memory stays flat regardless of feed size.  Entries with no geocode matching prefixes are dropped before any formatting work."""
+    prefixes = tuple(prefixes)
+    tag = '{' + ns['atom'] + '}entry'
+    
+    for event, entry in et.iterparse(source, events=('end',), tag=tag, huge_tree=True):
+        record = matchZones(makeAlertRecord(entry, ns), prefixes)
+        entry.clear()
+        while entry.getprevious() is not None:
+            del entry.getparent()[0]
+        if record is not None:
+            yield record
+
+def streamAlerts(locale, prefixes=(), session=None, timeout=None, url=FEED_URL):
+    """Stream a locale feed (normally the national 'us' feed) straight from the HTTP response into iterAlertRecords without buffering the body."""
+    countFetch()
+    with metrics.METRICS.timer('aprsnws_fetch_seconds', locale=locale):
+        r = (session or requests).get(makeFeedUrl(locale, url), timeout=timeout, stream=True)
+    checkResponse(locale, r)
+    r.raw.decode_content = True
+    
+    try:
+        yield from iterAlertRecords(r.raw, prefixes)
+    finally:
+        r.close()
+
+def getSnapshot(locale, session=None, timeout=None, url=FEED_URL):
+    """Fetch and parse the locale feed exactly once, returning a tuple of AlertRecords for the current cycle."""
+    return parseSnapshot(getAlerts(locale, session, timeout, url))
+
+def getCachedSnapshot(locale, cache, session=None, timeout=None, url=FEED_URL):
+    """Fetch a locale feed through a FeedCache using a conditional GET.  Returns (records, changed); changed is False when the server answers 304 or the body hash matches the cached copy, in which case the cached records are returned without parsing."""
+    newsfeed = makeFeedUrl(locale, url)
+    cached = cache.lookup(newsfeed)
+    headers = cache.conditionalHeaders(newsfeed) if cached is not None else {}
+    
+    countFetch()
+    with metrics.METRICS.timer('aprsnws_fetch_seconds', locale=locale):
+        r = (session or requests).get(newsfeed, timeout=timeout, headers=headers)
+    if r.status_code == 304 and cached is not None:
+        cache.hit(newsfeed, r.headers)
+        metrics.METRICS.inc('aprsnws_cache_hits_total', locale=locale)
+        return makeRecords(cached), False
+    
+    checkResponse(locale, r)
+    digest = cache.makeDigest(r.content)
+    if cached is not None and cache.isUnchanged(newsfeed, digest):
+        cache.hit(newsfeed, r.headers)
+        metrics.METRICS.inc('aprsnws_cache_hits_total', locale=locale)
+        return makeRecords(cached), False
+    
+    metrics.METRICS.inc('aprsnws_cache_misses_total', locale=locale)
+    with metrics.METRICS.timer('aprsnws_stage_seconds', stage='parse'):
+        records = parseSnapshot(et.parse(BytesIO(r.content)))
+    cache.store(newsfeed, r.headers, digest, [list(record) for record in records])
+    return records, True
+
+def getStreamedSnapshot(locale, cache, prefixes=(), session=None, timeout=None, url=FEED_URL):
+    """Stream a locale feed through a FeedCache.  The request is made conditional on the stored validators and a 304 returns the cached records with changed=False; otherwise the body is parsed incrementally as in streamAlerts.  The body is never buffered, so instead of a content hash the cache entry records the zone prefixes it was filtered with, and a copy filtered with other prefixes is not reused."""
+    newsfeed = makeFeedUrl(locale, url)
+    key = 'prefixes:' + ','.join(prefixes)
+    cached = cache.lookup(newsfeed) if cache.isUnchanged(newsfeed, key) else None
+    headers = cache.conditionalHeaders(newsfeed) if cached is not None else {}
+    
+    countFetch()
+    with metrics.METRICS.timer('aprsnws_fetch_seconds', locale=locale):
+        r = (session or requests).get(newsfeed, timeout=timeout, headers=headers, stream=True)
+    
+    try:
+        if r.status_code == 304 and cached is not None:
+            cache.hit(newsfeed, r.headers)
+            metrics.METRICS.inc('aprsnws_cache_hits_total', locale=locale)
+            return makeRecords(cached), False
+    
+        checkResponse(locale, r)
+        r.raw.decode_content = True
+        metrics.METRICS.inc('aprsnws_cache_misses_total', locale=locale)
+        with metrics.METRICS.timer('aprsnws_stage_seconds', stage='parse'):
+            records = tuple(iterAlertRecords(r.raw, prefixes))
+    finally:
+        r.close()
+    
+    cache.store(newsfeed, r.headers, key, [list(record) for record in records])
+    return records, True
+
+def makeRecords(rows):
+    """Rebuild AlertRecords from the plain lists stored in a FeedCache.  Rows cached before the references field was added get no references."""
+    return tuple(AlertRecord(*row[:14], tuple(row[14]), tuple(row[15]) if len(row) > 15 else ()) for row in rows)
+
+def parseUpdated(record):
+    """Return the atom:updated time of an AlertRecord as an aware datetime, or None if it is missing or malformed."""
+    try:
+        return datetime.datetime.fromisoformat(record.updated)
+    except ValueError:
+        return None
+
+def mergeSnapshots(snapshots):
+    """Merge several snapshots into one tuple of AlertRecords with duplicate entry IDs removed.  Feed order is preserved; when an entry appears in more than one feed the most recently updated copy is kept."""
+    merged = {}
+    
+    for snapshot in snapshots:
+        for record in snapshot:
+            seen = merged.get(record.id)
+            if seen is None:
+                merged[record.id] = record
+            else:
+                old, new = parseUpdated(seen), parseUpdated(record)
+                if old is not None and new is not None and new > old:
+                    merged[record.id] = record
+    return tuple(merged.values())
+
 #-----CLASSES-----#
+class AtomAdapter:
+    """Feed adapter for the CAP 1.1 ATOM feeds at alerts.weather.gov/cap/<locale>.php."""
+    
+    def __init__(self, url=FEED_URL, stream=False, prefixes=ZONE_PREFIXES):
+        """Initializes the adapter with the feed URL template.  With stream=True feeds are parsed incrementally and filtered by the zone prefixes."""
+        self.url = url
+        self.stream = stream
+        self.prefixes = tuple(prefixes)
+    
+    def makeUrl(self, locale):
+        """Return the feed URL for a locale; also its FeedCache key."""
+        return makeFeedUrl(locale, self.url)
+    
+    def fetch(self, locale, session=None, timeout=None, cache=None):
+        """Fetch and parse one locale.  Returns (records, changed)."""
+        if self.stream and cache is not None:
+            return getStreamedSnapshot(locale, cache, self.prefixes, session, timeout, self.url)
+        if self.stream:
+            with metrics.METRICS.timer('aprsnws_stage_seconds', stage='parse'):
+                return tuple(streamAlerts(locale, self.prefixes, session, timeout, self.url)), True
+        if cache is not None:
+            return getCachedSnapshot(locale, cache, session, timeout, self.url)
+        
+        tree = getAlerts(locale, session, timeout, self.url)
+        if tree is None:
+            raise IOError('no feed retrieved')
+        with metrics.METRICS.timer('aprsnws_stage_seconds', stage='snapshot'):
+            return parseSnapshot(tree), True
+
+class GeoJSONAdapter:
+    """Feed adapter for the api.weather.gov alerts API.  Filtering is done server-side (area or zone per locale, plus API_FILTERS), every cursor page is followed, and features are decoded with orjson when it is installed.  Produces the same AlertRecords as AtomAdapter."""
+    
+    def __init__(self, url=API_URL, filters=None, prefixes=ZONE_PREFIXES):
+        """Initializes the adapter with the API endpoint (overridable for a mirror or local fixtures), extra server-side filters and the zone prefixes to keep."""
+        self.url = url
+        self.filters = API_FILTERS if filters is None else filters
+        self.prefixes = tuple(prefixes)
+    
+    def makeUrl(self, locale):
+        """Return the first-page query URL for a locale; also its FeedCache key."""
+        return requests.Request('GET', self.url, params=nwsapi.makeParams(locale, self.filters)).prepare().url
+    
+    def fetch(self, locale, session=None, timeout=None, cache=None):
+        """Fetch every page of alerts for one locale.  Returns (records, changed); with a FeedCache the first page is requested conditionally and an unchanged result skips record building.  A 304 for the first page says nothing about later pages, so validators are only kept for single-page results; multi-page results are compared by body hash."""
+        session = session or requests
+        first = self.makeUrl(locale)
+        cached = cache.lookup(first) if cache is not None else None
+        headers = nwsapi.makeHeaders()
+        if cached is not None:
+            headers.update(cache.conditionalHeaders(first))
+        
+        link, bodies, features, validators = first, [], [], None
+        while link and len(bodies) < nwsapi.MAX_PAGES:
+            countFetch()
+            with metrics.METRICS.timer('aprsnws_fetch_seconds', locale=locale):
+                r = session.get(link, timeout=timeout, headers=headers if not bodies else nwsapi.makeHeaders())
+            if r.status_code == 304 and cached is not None and not bodies:
+                cache.hit(first, r.headers)
+                metrics.METRICS.inc('aprsnws_cache_hits_total', locale=locale)
+                return makeRecords(cached), False
+            checkResponse(locale, r)
+            validators = validators or r.headers
+            bodies.append(r.content)
+            with metrics.METRICS.timer('aprsnws_stage_seconds', stage='parse'):
+                page = nwsapi.loads(r.content)
+            features.extend(page.get('features') or ())
+            link = nwsapi.getNextUrl(page, link)
+        
+        if cache is not None:
+            validators = validators if len(bodies) == 1 else {}
+            digest = cache.makeDigest(b''.join(bodies))
+            if cached is not None and cache.isUnchanged(first, digest):
+                cache.hit(first, validators)
+                metrics.METRICS.inc('aprsnws_cache_hits_total', locale=locale)
+                return makeRecords(cached), False
+            metrics.METRICS.inc('aprsnws_cache_misses_total', locale=locale)
+        
+        with metrics.METRICS.timer('aprsnws_stage_seconds', stage='snapshot'):
+            records = tuple(r for r in (matchZones(AlertRecord(**nwsapi.makeAlertFields(f)), self.prefixes) for f in features) if r is not None)
+        if cache is not None:
+            cache.store(first, validators, digest, [list(record) for record in records])
+        return records, True
+
+class AlertPoller:
+    """Concurrent multi-locale feed poller.  All locales share one keep-alive connection pool; each locale is fetched in its own worker thread with its own timeout so a slow or failing feed never holds up the others."""
+    
+    def __init__(self, locales=LOCALES, timeout=FETCH_TIMEOUT, url=FEED_URL, workers=None, cache=None, stream=False, prefixes=ZONE_PREFIXES, adapter=None):
+        """Initializes the poller with the locales to poll, the per-locale timeout in seconds and the feed URL template.  An optional feedcache.FeedCache enables conditional GETs; self.changed then reports whether any feed changed on the last poll.  With stream=True feeds are parsed incrementally and filtered by the zone prefixes (the cache is not used in streaming mode).  Pass an adapter (e.g. GeoJSONAdapter) to poll a different feed; url, stream and prefixes then only apply to the default AtomAdapter."""
+        self.locales = tuple(locales)
+        self.timeout = timeout
+        self.url = url
+        self.workers = workers or max(len(self.locales), 1)
+        self.cache = cache
+        self.stream = stream
+        self.prefixes = tuple(prefixes)
+        self.adapter = adapter or AtomAdapter(url, stream, prefixes)
+        self.errors = {}
+        self.changed = True
+        self.retry_after = None
+        self._changed = {}
+        
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.workers, pool_maxsize=self.workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+    
+    def fetchLocale(self, locale):
+        """Fetch and parse a single locale.  Failures are recorded in self.errors and yield an empty snapshot (or the last cached one) rather than raising."""
+        try:
+            records, self._changed[locale] = self.adapter.fetch(locale, self.session, self.timeout, self.cache)
+            metrics.METRICS.set('aprsnws_entries', len(records), locale=locale)
+            return records
+        
+        except Exception as ex:
+            metrics.METRICS.inc('aprsnws_errors_total', stage='poll', locale=locale)
+            self.errors[locale] = str(ex)
+            print(f'fetchLocale Exception ({locale}): {ex}')
+            cached = self.cache.lookup(self.adapter.makeUrl(locale)) if self.cache is not None else None
+            return makeRecords(cached) if cached is not None else ()
+    
+    def poll(self):
+        """Fetch all configured locales concurrently and return one merged, de-duplicated tuple of AlertRecords."""
+        self.errors = {}
+        self._changed = {}
+        
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            snapshots = list(pool.map(self.fetchLocale, self.locales))
+        
+        if self.cache is not None:
+            self.changed = any(self._changed.values())
+            self.cache.save()
+        
+        with _fetch_lock:
+            delays = [RETRY_AFTER.pop(locale) for locale in self.locales if locale in RETRY_AFTER]
+        self.retry_after = max(delays) if delays else None
+        return mergeSnapshots(snapshots)
+    
+    def close(self):
+        """Close the pooled HTTP connections."""
+        self.session.close()
+
+class PollScheduler:
+    """Adaptive poll interval.  Polls at MIN_INTERVAL while any active alert is Extreme/Severe or Immediate, at the base interval after a change, and backs off towards MAX_INTERVAL while feeds are empty or unchanged.  Every interval gets random jitter, and a server Retry-After is always honoured."""
+    
+    def __init__(self, base=POLL_INTERVAL, minimum=MIN_INTERVAL, maximum=MAX_INTERVAL, factor=BACKOFF_FACTOR, jitter=JITTER, rng=None):
+        """Initializes the scheduler.  Pass a seeded random.Random for deterministic intervals."""
+        self.base = base
+        self.minimum = minimum
+        self.maximum = maximum
+        self.factor = factor
+        self.jitter = jitter
+        self.rng = rng or random.Random()
+        self.interval = base
+    
+    def isUrgent(self, snapshot):
+        """Return True if any alert in the snapshot is Extreme/Severe or Immediate."""
+        return any(r.severity in ('Extreme', 'Severe') or r.urgency == 'Immediate' for r in snapshot)
+    
+    def nextInterval(self, snapshot, changed, retry_after=None, backlog=False):
+        """Return the number of seconds to wait before the next poll, given the last cycle's snapshot (None if the cycle failed), whether any feed changed, any server Retry-After, and whether packets are still waiting for airtime (which stops the back-off)."""
+        if snapshot and self.isUrgent(snapshot):
+            self.interval = self.minimum
+        elif snapshot is None or (changed and snapshot) or backlog:
+            self.interval = self.base
+        else:
+            self.interval = min(max(self.interval, self.base) * self.factor, self.maximum)
+        
+        delay = self.interval * (1 + self.rng.uniform(-self.jitter, self.jitter))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
 class XMLHandler:
     """Methods for extracting alert data from the NWS ATOM feed."""
 
@@ -50,18 +459,33 @@ class XMLHandler:
         
         Namespaces are unique to the XML file being parsed and are defined in the self.ns variable.  Even if only using a default namespace, that namespace MUST be defined and used in path construction for lxml to parse the XML file.  See <https://lxml.de/xpathxslt.html> for more details."""
         
-        self.ns = {"atom":"http://www.w3.org/2005/Atom",
-                   "cap":"urn:oasis:names:tc:emergency:cap:1.1",
-                   "ha":"http://www.alerting.net/namespace/index_1.0"
-                  }
+        self.ns = NS
+        self.snapshot = None
+    
+    def loadSnapshot(self, locale=LOCALE, poller=None):
+        """Fetch the locale feed once and hold the parsed AlertRecords for all following getEntry* calls.  If an AlertPoller is given, all of its locales are fetched and merged instead.  Call once per cycle to refresh."""
+        self.snapshot = poller.poll() if poller else getSnapshot(locale)
+        return self.snapshot
+    
+    def getEntryField(self, enum, field):
+        """Return a snapshot field for feed entry enum (1-based) as a single-item list, matching the XPath text() results the getters have always returned."""
+        if self.snapshot is None:
+            self.loadSnapshot()
+        
+        if enum < 1 or enum > len(self.snapshot):
+            return []
+        
+        value = getattr(self.snapshot[enum - 1], field)
+        if field == 'geocodes':
+            value = ' '.join(value)
+        return [value] if value else []
             
     def getEntryId(self, enum, default='N/A'):
         """Get feed entry ID number."""
         self.enum = enum
         
         try:
-            self.path = 'atom:entry[' + str(self.enum) + ']/atom:id/text()'
-            self.i = getAlerts(LOCALE).xpath(self.path, namespaces=self.ns)
+            self.i = self.getEntryField(self.enum, 'id')
             return self.i if self.enum else default
         
         except Exception as ex:
@@ -72,8 +496,7 @@ class XMLHandler:
         self.enum = enum
         
         try:
-            self.path = 'atom:entry[' + str(self.enum) + ']/atom:published/text()'
-            self.i = getAlerts(LOCALE).xpath(self.path, namespaces=self.ns)
+            self.i = self.getEntryField(self.enum, 'published')
             return self.i if self.enum else default
         
         except Exception as ex:
@@ -84,8 +507,7 @@ class XMLHandler:
         self.enum = enum
         
         try:
-            self.path = 'atom:entry[' + str(self.enum) + ']/atom:updated/text()'
-            self.i = getAlerts(LOCALE).xpath(self.path, namespaces = self.ns)
+            self.i = self.getEntryField(self.enum, 'updated')
             return self.i if self.enum else default
         
         except Exception as ex:
@@ -96,8 +518,7 @@ class XMLHandler:
         self.enum = enum
         
         try:
-            self.path = 'atom:entry[' + str(self.enum) + ']/cap:event/text()'
-            self.i = getAlerts(LOCALE).xpath(self.path, namespaces = self.ns)
+            self.i = self.getEntryField(self.enum, 'event')
             return self.i if self.enum else default
         
         except Exception as ex:
@@ -108,8 +529,7 @@ class XMLHandler:
         self.enum = enum
         
         try:
-            self.path = 'atom:entry[' + str(self.enum) + ']/cap:effective/text()'
-            self.i = getAlerts(LOCALE).xpath(self.path, namespaces = self.ns)
+            self.i = self.getEntryField(self.enum, 'effective')
             return self.i if self.enum else default
         
         except Exception as ex:
@@ -120,8 +540,7 @@ class XMLHandler:
         self.enum = enum
         
         try:
-            self.path = 'atom:entry[' + str(self.enum) + ']/cap:expires/text()'
-            self.i = getAlerts(LOCALE).xpath(self.path, namespaces = self.ns)
+            self.i = self.getEntryField(self.enum, 'expires')
             return self.i if self.enum else default
         
         except Exception as ex:
@@ -132,8 +551,7 @@ class XMLHandler:
         self.enum = enum
         
         try:
-            self.path = 'atom:entry[' + str(self.enum) + ']/cap:status/text()'
-            self.i = getAlerts(LOCALE).xpath(self.path, namespaces = self.ns)
+            self.i = self.getEntryField(self.enum, 'status')
             return self.i if self.enum else default
         
         except Exception as ex:
@@ -144,8 +562,7 @@ class XMLHandler:
         self.enum = enum
         
         try:
-            self.path = 'atom:entry[' + str(self.enum) + ']/cap:msgType/text()'
-            self.i = getAlerts(LOCALE).xpath(self.path, namespaces = self.ns)
+            self.i = self.getEntryField(self.enum, 'msgType')
             return self.i if self.enum else default
         
         except Exception as ex:
@@ -156,8 +573,7 @@ class XMLHandler:
         self.enum = enum
         
         try:
-            self.path = 'atom:entry[' + str(self.enum) + ']/cap:category/text()'
-            self.i = getAlerts(LOCALE).xpath(self.path, namespaces = self.ns)
+            self.i = self.getEntryField(self.enum, 'category')
             return self.i if self.enum else default
         
         except Exception as ex:
@@ -168,8 +584,7 @@ class XMLHandler:
         self.enum = enum
         
         try:           
-            self.path = 'atom:entry[' + str(self.enum) + ']/cap:urgency/text()'
-            self.i = getAlerts(LOCALE).xpath(self.path, namespaces = self.ns)
+            self.i = self.getEntryField(self.enum, 'urgency')
             return self.i if self.enum else default
         
         except Exception as ex:
@@ -180,8 +595,7 @@ class XMLHandler:
         self.enum = enum
         
         try:
-            self.path = 'atom:entry[' + str(self.enum) + ']/cap:severity/text()'
-            self.i = getAlerts(LOCALE).xpath(self.path, namespaces = self.ns)
+            self.i = self.getEntryField(self.enum, 'severity')
             return self.i if self.enum else default
         
         except Exception as ex:
@@ -192,8 +606,7 @@ class XMLHandler:
         self.enum = enum
         
         try:
-            self.path = 'atom:entry[' + str(self.enum) + ']/cap:certainty/text()'
-            self.i = getAlerts(LOCALE).xpath(self.path, namespaces = self.ns)
+            self.i = self.getEntryField(self.enum, 'certainty')
             return self.i if self.enum else default
         
         except Exception as ex:
@@ -204,8 +617,7 @@ class XMLHandler:
         self.enum = enum
         
         try:
-            self.path = 'atom:entry[' + str(self.enum) + ']/cap:polygon/text()'
-            self.i = getAlerts(LOCALE).xpath(self.path, namespaces = self.ns)
+            self.i = self.getEntryField(self.enum, 'polygon')
             return self.i if self.enum else default
         
         except Exception as ex:
@@ -216,8 +628,7 @@ class XMLHandler:
         self.enum = enum
         
         try:
-            self.path = 'atom:entry[' + str(self.enum) + ']/cap:areaDesc/text()'
-            self.i = getAlerts(LOCALE).xpath(self.path, namespaces = self.ns)
+            self.i = self.getEntryField(self.enum, 'areaDesc')
             return self.i if self.enum else default
         
         except Exception as ex:
@@ -228,8 +639,7 @@ class XMLHandler:
         self.enum = enum
         
         try:
-            self.path = 'atom:entry[' + str(self.enum) + ']/cap:geocode/atom:value[2]/text()'
-            self.i = getAlerts(LOCALE).xpath(self.path, namespaces = self.ns)
+            self.i = self.getEntryField(self.enum, 'geocodes')
             return self.i if self.enum else default
         
         except Exception as ex:
@@ -243,14 +653,17 @@ class MsgHandler:
         self.encoding = 'utf-8'
     
     def makeToCall(self, geocode):
-        """Create a 9-byte to-call for weather alert messages using the format XXXXXX___, where XXXXXX is a standardized NWS six-byte alert zone or county identifier, followed by three spaces.  Per the APRS specification, the to-call is a fixed 9-byte address."""
+        """Create a 9-byte to-call for weather alert messages using the format XXXXXX___, where XXXXXX is a standardized NWS six-byte alert zone or county identifier, followed by three spaces.  Per the APRS specification, the to-call is a fixed 9-byte address.  A space-separated group of geocodes gets the packed-bulletin address: their shared state/type prefix (e.g. NMZ) padded to 9 bytes.  Groups mixing prefixes have no common address and are rejected; split them with bulletin.packZones."""
         self.geocode = geocode
         
         try:
             if len(self.geocode) <= 6:
                 self.tocall = str(self.geocode + '   ')
             else:
-                self.tocall = self.geocode.split(' ')
+                prefixes = {zone[:3] for zone in self.geocode.split()}
+                if len(prefixes) != 1:
+                    raise ValueError(f'geocodes {self.geocode} do not share one state/type prefix')
+                self.tocall = prefixes.pop().ljust(9)
             return self.tocall
         
         except Exception as ex:
@@ -279,69 +692,259 @@ class MsgHandler:
             print(f'makeWxMsgPacket Exception: {ex}')
     
     def appendMsgId(self, msg):
-        """Append a valid APRS message ID to a constructed message using the Python hash() function.  NOTE: hash() can only be used on immutable Python objects.  Returns the entire message w/ ID."""
+        """Append a valid APRS message ID to a constructed message.  The ID is derived from the CRC-32 of the message (see bulletin.makeMsgId), so it is stable across restarts and instances.  Returns the entire message w/ ID."""
         self.msg = msg
         
         try:
-            self.h = str(hash(self.msg))
-            self.m_id = self.h[-5:]
+            self.m_id = bulletin.makeMsgId(self.msg)
             self.t_msg = str(self.msg + '{' + self.m_id)
             return self.t_msg
         
         except Exception as ex:
             print(f'appendMsgId Exception: {ex}')
     
-def main():
-    """Main program."""
+def makeOutputs(queue):
+    """Build the configured output sinks.  The aprx spool is included unless queue is None (SPOOL_ENABLED off); APRS-IS and KISS TCP sinks are added when their servers are configured."""
+    outputs = [sinks.SpoolSink(queue)] if queue is not None else []
+    
+    if APRSIS_SERVER:
+        outputs.append(sinks.APRSISSink(APRSIS_SERVER, CALLSIGN, PASSCODE, filter=APRSIS_FILTER))
+    if KISS_SERVER:
+        outputs.append(sinks.KISSSink(KISS_SERVER, CALLSIGN, port=KISS_PORT))
+    return outputs
+
+def makeAdapter():
+    """Build the feed adapter selected by FEED_ADAPTER."""
+    if FEED_ADAPTER == 'geojson':
+        return GeoJSONAdapter(API_URL, API_FILTERS, ZONE_PREFIXES)
+    return AtomAdapter(FEED_URL, STREAM_FEED, ZONE_PREFIXES)
+
+def makeGeoFilter():
+    """Build the configured geo.GeoFilter, or None if no footprint is configured.  NumPy is only imported when geofencing is enabled."""
+    if GEOFENCE_POLYGON is None and GEOFENCE_STATION is None:
+        return None
+    
+    import geo
+    if GEOFENCE_POLYGON is not None:
+        return geo.GeoFilter(coverage=GEOFENCE_POLYGON)
+    return geo.GeoFilter(station=GEOFENCE_STATION, radius_km=GEOFENCE_RADIUS_KM)
+
+def deliver(outputs, packets):
+    """Send packets to every output sink.  A sink still holding a copy of a packet is not sent it again.  A failing sink never stops delivery to the others."""
+    if not packets:
+        return
+    
+    for output in outputs:
+        try:
+            waiting = output.queued(packets)
+            fresh = [p for p in packets if p not in waiting] if waiting else packets
+            if fresh:
+                output.send(fresh)
+        except Exception as ex:
+            metrics.METRICS.inc('aprsnws_errors_total', stage='sink')
+            print(f'deliver Exception ({type(output).__name__}): {ex}')
+
+def sendPackets(record, packets, outputs, txsched=None, penalty=0):
+    """Hand one alert's packets to the TransmitScheduler if there is one, otherwise straight to the output sinks."""
+    if txsched is not None:
+        txsched.submit(record, packets, penalty)
+    else:
+        deliver(outputs, packets)
+
+def purgePackets(packets, outputs, txsched=None):
+    """Remove superseded or expired packets that are still waiting in the TransmitScheduler or held by any output sink (the spool, or a disconnected TCP sink's buffer).  Returns the number removed."""
+    if not packets:
+        return 0
+    
+    removed = sum(output.purge(packets) for output in outputs) + (txsched.discard(packets) if txsched is not None else 0)
+    metrics.METRICS.inc('aprsnws_packets_purged_total', removed)
+    return removed
+
+def maintainStore(store, outputs, txsched=None):
+    """Expire alerts off the AlertStore heap, purging their queued packets (except a Cancel's), drop retired Cancels that have gone out, and re-send every still-active alert whose re-beacon is due.  Still-waiting packets are tracked per sink: a packet is re-sent only if it has left the scheduler and at least one sink, and deliver() skips the sinks still holding it, so the tail of a large alert is never pushed back.  Returns (purged, rebeaconed)."""
+    ids, expired = store.expire()
+    purged = purgePackets(expired, outputs, txsched)
+    rebeaconed = 0
+    
+    for record, packets, penalty in store.dueBeacons():
+        held = txsched.queued(packets) if txsched is not None else set()
+        waiting = [output.queued(packets) for output in outputs]
+        resend = [p for p in packets if p not in held and not all(p in w for w in waiting)]
+        if resend:
+            sendPackets(record, resend, outputs, txsched, penalty)
+            rebeaconed += 1
+    metrics.METRICS.inc('aprsnws_rebeacons_total', rebeaconed)
+    store.prune(lambda packets: (txsched is not None and txsched.queued(packets)) or any(output.queued(packets) for output in outputs))
+    return purged, rebeaconed
+
+def seedStore(store, records, formatter, geofence=None, now=None):
+    """Track alerts that are already on the air but missing from the AlertStore (e.g. after a restart) without sending them, so they are re-beaconed, superseded and expired like any other alert.  Expired and geofence-suppressed alerts are skipped.  Returns the packets of alerts they supersede, which should be purged."""
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    records = [r for r in records if r.id not in store and not alertstate.isExpired(r.expires, now)]
+    outside = set()
+    if geofence is not None and records:
+        records, far = geofence.filter(records)
+        if GEOFENCE_MODE == 'deprioritize':
+            records += far
+            outside = {r.id for r in far}
+    
+    superseded = []
+    for record, packets in formatter.renderSnapshot(records):
+        superseded.extend(store.track(record, packets, scheduler.OUTSIDE_PENALTY if record.id in outside else 0))
+    return superseded
+
+def waitForPoll(stop, delay, txsched=None, outputs=()):
+    """Wait delay seconds for the next poll, or until stop is set.  While the TransmitScheduler holds a backlog, wake each time the token bucket earns a packet and release it to the outputs, rather than leaving the backlog until the next cycle."""
+    deadline = time.monotonic() + delay
+    
+    while not stop.is_set():
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        if txsched is None or not txsched.depth():
+            stop.wait(remaining)
+            continue
+        stop.wait(min(remaining, txsched.nextRelease()))
+        deliver(outputs, txsched.release())
+
+def main(poller=None, state=None, queue=None, formatter=None, txsched=None, outputs=None, geofence=None, store=None):
+    """Main program.  Pass a long-lived AlertPoller to reuse its connection pool between cycles.  Only alerts that are new, updated or cancelled since the last cycle (per the persistent AlertState) are bulletined.  Packets go to the output sinks (by default the AlertSpool drained by aprxfeeder.py); if a long-lived TransmitScheduler is given, they pass through it first and are released by priority within the airtime budget.  If a geo.GeoFilter is given, alerts whose polygon misses the coverage area are suppressed (or, in 'deprioritize' mode with a scheduler, sent last) before formatting.  A long-lived alertstore.AlertStore tracks the packets queued for each alert: updates, cancels and expiries purge superseded packets from the sinks and scheduler, and still-active alerts are re-beaconed from its heap.  After a restart, unchanged alerts are rendered once to re-seed the store without being re-sent."""
     x = XMLHandler()
     m = MsgHandler()
     
     try:
-        if os.path.exists('/tmp/wxalerts.txt'):
-            os.remove('/tmp/wxalerts.txt')
-            
-        entries = int(getAlerts(LOCALE).xpath('count(atom:entry)', namespaces = x.ns))
+        poller = poller or AlertPoller(LOCALES)
+        state = state or alertstate.AlertState()
+        formatter = formatter or bulletin.BulletinFormatter(appendId=m.appendMsgId, pack=PACK_ZONES)
+        store = store if store is not None else alertstore.AlertStore()
+        if outputs is None:
+            queue = queue or spool.AlertSpool()
+            outputs = [sinks.SpoolSink(queue)]
+        for output in outputs:
+            output.poll()
+        entries = len(x.loadSnapshot(LOCALE, poller))
+        if not poller.changed:
+            print('Alert feeds unchanged since last poll.')
+            superseded = seedStore(store, x.snapshot, formatter, geofence)
+            purged, rebeaconed = maintainStore(store, outputs, txsched)
+            purged += purgePackets(superseded, outputs, txsched)
+            if purged or rebeaconed:
+                print(f'{purged} expired packets purged, {rebeaconed} alerts re-beaconed.')
+            if txsched is not None:
+                deliver(outputs, txsched.release())
+            return x.snapshot
+        
+        diff = state.diff(x.snapshot)
+        changed = {r.id for r in diff.new + diff.updated + diff.cancelled}
         print(f'There are currently {entries} entries in the locale ATOM feed.')
-        
-        e = 1
-        while e <= entries:
-            zones = x.getEntryEventGeocodeValue(e)
-            evttype = x.getEntryEventType(e)
-            atype = x.getEntryEventMessageType(e)
-            severity = x.getEntryEventSeverity(e)
-            certainty = x.getEntryEventCertainty(e)
-            urgency = x.getEntryEventUrgency(e)
-            category = x.getEntryEventCategory(e)
-            evt_start = x.getEntryEventEffective(e)
-            evt_end = x.getEntryEventExpires(e)
-                        
-            #Convert raw data to APRS-formatted data
-            f_evttype = cap.makeEventType(evttype)
-            f_alt_type = cap.makeAlertType(atype)
-            f_severity = cap.makeSeverity(severity)
-            f_certainty = cap.makeCertainty(certainty)
-            f_urgency = cap.makeUrgency(urgency)
-            f_category = cap.makeCategory(category)
-            f_evt_start = cap.makeEffectiveStart(evt_start[0])
-            f_evt_end = cap.makeEffectiveEnd(evt_end[0])
-            
-            wxmsg = m.makeWxMsgPacket(f_evttype, f_alt_type, f_severity, f_certainty, f_urgency, f_category, f_evt_start, f_evt_end)
+        print(f'{len(diff.new)} new, {len(diff.updated)} updated, {len(diff.cancelled)} cancelled, {len(diff.expired)} expired, {len(diff.unchanged)} unchanged.')
+        
+        with metrics.METRICS.timer('aprsnws_stage_seconds', stage='format'):
+            pending = [r for r in x.snapshot if r.id in changed]
+            outside = set()
+            if geofence is not None:
+                pending, far = geofence.filter(pending)
+                metrics.METRICS.inc('aprsnws_geofenced_total', len(far))
+                if GEOFENCE_MODE == 'deprioritize':
+                    pending += far
+                    outside = {r.id for r in far}
+                elif far:
+                    print(f'{len(far)} alerts outside the coverage area suppressed.')
+            rendered = formatter.renderSnapshot(pending)
+        
+        if formatter.pack and formatter.savings:
+            zonecount = sum(z for i, z, p in formatter.savings)
+            packetcount = sum(p for i, z, p in formatter.savings)
+            metrics.METRICS.inc('aprsnws_packets_saved_total', zonecount - packetcount)
+            print(f'Zone packing: {packetcount} packets for {zonecount} zones ({zonecount - packetcount} saved).')
+        
+        with metrics.METRICS.timer('aprsnws_stage_seconds', stage='spool'):
+            purged = sum(purgePackets(store.retire(i), outputs, txsched) for i in diff.expired)
+            purged += purgePackets(seedStore(store, diff.unchanged, formatter, geofence), outputs, txsched)
+            for record, packets in rendered:
+                penalty = scheduler.OUTSIDE_PENALTY if record.id in outside else 0
+                superseded = store.track(record, packets, penalty)
+                metrics.METRICS.inc('aprsnws_zones_total', len(record.geocodes))
+                metrics.METRICS.inc('aprsnws_packets_total', len(packets))
+                purged += purgePackets(superseded, outputs, txsched)
+                sendPackets(record, packets, outputs, txsched, penalty)
+                for packet in packets:
+                    sys.stdout.write(packet)
             
-            zonelist = zones[0].split(' ')
-            for z in zonelist:
-                tocall = m.makeToCall(z)
-                zonetext = nm.makeNMZoneText(z)    #TODO:  this will have to change when getAlerts is modified for multiple locales
-                fullmsg = (f':{tocall}:{zonetext} ' + wxmsg)
-                with open('/tmp/wxalerts.txt', 'a') as f:
-                    f.writelines(m.appendMsgId(fullmsg) + '\n')
-                sys.stdout.write(m.appendMsgId(fullmsg))
-            e += 1
+            expired, rebeaconed = maintainStore(store, outputs, txsched)
+            print(f'{purged + expired} superseded or expired packets purged, {rebeaconed} alerts re-beaconed.')
+            if txsched is not None:
+                deliver(outputs, txsched.release())
+                metrics.METRICS.set('aprsnws_scheduler_pending', txsched.depth())
+                metrics.METRICS.set('aprsnws_scheduler_dropped', txsched.dropped)
+                print(f'{txsched.depth()} packets awaiting airtime, {txsched.dropped} dropped.')
+        
+        state.apply(diff)
+        metrics.METRICS.inc('aprsnws_alerts_total', len(diff.new), change='new')
+        metrics.METRICS.inc('aprsnws_alerts_total', len(diff.updated), change='updated')
+        metrics.METRICS.inc('aprsnws_alerts_total', len(diff.cancelled), change='cancelled')
+        metrics.METRICS.inc('aprsnws_alerts_total', len(diff.expired), change='expired')
+        if queue is not None:
+            metrics.METRICS.set('aprsnws_spool_depth', queue.depth())
+            metrics.METRICS.set('aprsnws_spool_age_seconds', queue.age())
+            print(f'{queue.depth()} packets queued, oldest {queue.age():.0f}s.')
+        return x.snapshot
             
     except Exception as ex:
+        metrics.METRICS.inc('aprsnws_errors_total', stage='main')
         print(f'Main Exception: {ex}')
         pass
             
+def run(once=False):
+    """Run the daemon.  Polls on the adaptive PollScheduler interval until SIGTERM/SIGINT, then flushes any packets still waiting for airtime into the spool and closes every sink.  With once=True, runs a single cycle (for cron) and queues everything it produced."""
+    poller = AlertPoller(LOCALES, cache=feedcache.FeedCache(), adapter=makeAdapter())
+    state = alertstate.AlertState()
+    queue = spool.AlertSpool() if SPOOL_ENABLED else None
+    outputs = makeOutputs(queue)
+    if not outputs:
+        print('No output sinks configured: enable SPOOL_ENABLED or set APRSIS_SERVER/KISS_SERVER.')
+    for output in outputs:
+        output.start()
+    txsched = None if once else scheduler.TransmitScheduler()     # Fixed small burst; waitForPoll releases the backlog between polls.
+    pacer = PollScheduler()
+    geofence = makeGeoFilter()
+    store = alertstore.AlertStore(REBEACON_INTERVAL)
+    stop = threading.Event()
+    
+    def shutdown(signum, frame):
+        print(f'Received signal {signum}, shutting down.')
+        stop.set()
+    
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    metrics.METRICS.enabled = METRICS_ENABLED
+    if METRICS_ENABLED and METRICS_PORT:
+        metrics.METRICS.serve(METRICS_PORT)
+    metrics.PROFILER.install()
+    
+    try:
+        while not stop.is_set():
+            with metrics.PROFILER.cycle():
+                snapshot = main(poller, state, queue, txsched=txsched, outputs=outputs, geofence=geofence, store=store)
+            metrics.METRICS.writeStats()
+            if once:
+                break
+            delay = pacer.nextInterval(snapshot, poller.changed, poller.retry_after, txsched.depth() > 0)
+            metrics.METRICS.set('aprsnws_poll_interval_seconds', delay)
+            print(f'Next poll in {delay:.0f}s.')
+            waitForPoll(stop, delay, txsched, outputs)
+    
+    finally:
+        if txsched is not None and txsched.depth() and queue is not None:
+            queue.push(txsched.drain())
+        for output in outputs:
+            output.close()
+        if queue is not None:
+            queue.close()
+        poller.close()
+
 if __name__ == '__main__':
-    while True:
-        main()
-        time.sleep(14400)
+    parser = argparse.ArgumentParser(description='Convert NWS CAP alerts to APRS-NWS bulletins.')
+    parser.add_argument('--once', action='store_true', help='run a single poll cycle and exit (for cron)')
+    args = parser.parse_args()
+    run(args.once)
@@ -1,19 +1,18 @@
 #!/usr/bin/python3
 
-import sys, os
+import sys
+import spool
 
-if os.path.exists('/tmp/wxalerts.txt'):
-    with open('/tmp/wxalerts.txt', 'r+') as f:
-        lines = f.readines()
-        if len(lines) != 0:
-            sys.stdout.write(lines[0] + '\n')
-            f.seek(0)
-            f.truncate()
-            f.writelines(lines[1:])
-        elif len(lines) == 0:
-            print('No alerts to process.')
-        else:
-            print('Unknown file length.')
-    f.close()
-else:
-    print('No alert file to parse.')
+# Exec'd by aprx once per beacon interval: pop the next queued packet and write it to stdout for transmission.
+# Diagnostics go to stderr so aprx never transmits them.
+try:
+    s = spool.AlertSpool()
+    packet = s.pop()
+    if packet is not None:
+        sys.stdout.write(packet + '\n')
+    else:
+        print('No alerts to process.', file=sys.stderr)
+    s.close()
+
+except Exception as ex:
+    print(f'aprxfeeder Exception: {ex}', file=sys.stderr)
@@ -0,0 +1,372 @@
+#!/usr/bin/python3
+
+# APRS-NWS
+# Copyright 2021, Kurt Kochendarfer (KE7KUS)
+
+# ===GNU Public License v3===
+# This file is part of APRS-NWS.
+
+# APRS-NWS is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License 
+# as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+# APRS-NWS is distributed in the hope that it will be useful,but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License along with APRS-NWS.  If not, see <https://www.gnu.org/licenses/>.
+
+#-----IMPORTS-----#
+import os, io, sys, json, time, random, platform, argparse, resource, tempfile, threading, contextlib, http.server, socket, socketserver
+from urllib.parse import urlsplit, parse_qs
+from concurrent.futures import ProcessPoolExecutor
+
+#-----GLOBALS-----#
+SIZES = (10, 1000, 10000)
+RESULTS_PATH = 'bench_results.json'
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'api')    # Synthetic api.weather.gov pages, hand-written in the API's GeoJSON format.
+EVENTS = ('Tornado Warning', 'Severe Thunderstorm Warning', 'Flash Flood Warning', 'Winter Storm Warning', 'Red Flag Warning',
+          'Wind Advisory', 'Frost Advisory', 'Special Weather Statement', 'Flood Watch', 'Excessive Heat Warning')
+SEVERITIES = ('Extreme', 'Severe', 'Moderate', 'Minor')
+URGENCIES = ('Immediate', 'Expected', 'Future')
+CERTAINTIES = ('Observed', 'Likely', 'Possible')
+STATES = ('NM', 'AZ', 'CO', 'TX', 'UT', 'OK')
+
+def makePolygon(rng, points):
+    """Return a closed CAP polygon string of points lat/lon pairs around a random centre."""
+    lat, lon = rng.uniform(25, 48), rng.uniform(-124, -70)
+    ring = [f'{lat + rng.uniform(-0.5, 0.5):.2f},{lon + rng.uniform(-0.5, 0.5):.2f}' for n in range(max(points - 1, 3))]
+    return ' '.join(ring + ring[:1])
+
+def makeEntry(rng, n, zones_per, polygon_points):
+    """Return one synthetic CAP 1.1 atom:entry."""
+    state = rng.choice(STATES)
+    zones = ' '.join(f'{state}Z{rng.randint(1, 999):03d}' for z in range(rng.randint(1, zones_per)))
+    event = rng.choice(EVENTS)
+    return f'''<entry>
+<id>https://alerts.weather.gov/cap/wwacapget.php?x=BENCH{n:07d}</id>
+<updated>2021-01-14T18:00:00-07:00</updated>
+<published>2021-01-14T18:00:00-07:00</published>
+<author><name>w-nws.webmaster@noaa.gov</name></author>
+<title>{event} issued January 14 at 6:00PM MST by NWS</title>
+<link href="https://alerts.weather.gov/cap/wwacapget.php?x=BENCH{n:07d}"/>
+<summary>...SYNTHETIC BENCHMARK ALERT...</summary>
+<cap:event>{event}</cap:event>
+<cap:effective>2021-01-14T18:00:00-07:00</cap:effective>
+<cap:expires>2099-01-15T22:00:00-07:00</cap:expires>
+<cap:status>Actual</cap:status>
+<cap:msgType>Alert</cap:msgType>
+<cap:category>Met</cap:category>
+<cap:urgency>{rng.choice(URGENCIES)}</cap:urgency>
+<cap:severity>{rng.choice(SEVERITIES)}</cap:severity>
+<cap:certainty>{rng.choice(CERTAINTIES)}</cap:certainty>
+<cap:areaDesc>Synthetic Area {n}</cap:areaDesc>
+<cap:polygon>{makePolygon(rng, polygon_points) if polygon_points else ''}</cap:polygon>
+<cap:geocode>
+<valueName>FIPS6</valueName>
+<value>035001</value>
+<valueName>UGC</valueName>
+<value>{zones}</value>
+</cap:geocode>
+<cap:parameter>
+<valueName>VTEC</valueName>
+<value></value>
+</cap:parameter>
+</entry>
+'''
+
+def makeFeed(entries, zones_per=8, polygon_points=20, seed=0):
+    """Generate a synthetic NWS ATOM/CAP 1.1 feed of the given number of entries as bytes.  The same seed always yields the same feed."""
+    rng = random.Random(seed)
+    head = ('<?xml version = \'1.0\' encoding = \'UTF-8\' standalone = \'yes\'?>\n'
+            '<feed xmlns = \'http://www.w3.org/2005/Atom\' xmlns:cap = \'urn:oasis:names:tc:emergency:cap:1.1\' '
+            'xmlns:ha = \'http://www.alerting.net/namespace/index_1.0\'>\n'
+            '<id>https://alerts.weather.gov/cap/us.atom</id>\n<title>Synthetic benchmark feed</title>\n'
+            '<updated>2021-01-14T18:00:00-07:00</updated>\n')
+    body = ''.join(makeEntry(rng, n, zones_per, polygon_points) for n in range(entries))
+    return (head + body + '</feed>\n').encode('utf-8')
+
+#-----CLASSES-----#
+class FeedServer:
+    """Local HTTP stand-in for alerts.weather.gov and api.weather.gov.  Serves <name>.xml from a directory as /<name>.php, and <name>.json for any path ending in /<name> (e.g. /alerts/active); a cursor query parameter selects the page file <name>-<cursor>.json.  Honours If-None-Match with a 304.  Pages are whatever is in the directory; the bundled fixtures/api pages are synthetic, not recordings of the live API."""
+    
+    def __init__(self, root):
+        """Starts the server on a free localhost port in a daemon thread."""
+        self.root = root
+        self.requests = 0
+        server = self
+        
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            
+            def log_message(self, *args):
+                pass
+            
+            def do_GET(self):
+                server.requests += 1
+                url = urlsplit(self.path)
+                name = os.path.basename(url.path).rsplit('.', 1)[0]
+                cursor = parse_qs(url.query).get('cursor')
+                path = os.path.join(server.root, name + '.xml')
+                kind = 'application/atom+xml'
+                if not os.path.exists(path):
+                    path = os.path.join(server.root, name + (f'-{cursor[0]}' if cursor else '') + '.json')
+                    kind = 'application/geo+json'
+                if not os.path.exists(path):
+                    self.send_response(404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                etag = f'"{int(os.path.getmtime(path) * 1000)}-{os.path.getsize(path)}"'
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                with open(path, 'rb') as f:
+                    body = f.read()
+                self.send_response(200)
+                self.send_header('Content-Type', kind)
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('ETag', etag)
+                self.end_headers()
+                self.wfile.write(body)
+        
+        self.httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.httpd.server_port}/' + '{locale}.php?x=0'
+        self.api_url = f'http://127.0.0.1:{self.httpd.server_port}/alerts/active'
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+    
+    def close(self):
+        """Stop the server."""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+def decodeKISS(data):
+    """Split a KISS byte stream into unescaped AX.25 frames (port/command byte removed).  Returns (frames, unconsumed tail)."""
+    *chunks, rest = data.split(b'\xc0')
+    frames = []
+    for chunk in chunks:
+        if chunk:
+            frames.append(chunk[1:].replace(b'\xdb\xdc', b'\xc0').replace(b'\xdb\xdd', b'\xdb'))
+    return frames, rest
+
+class TNCServer:
+    """Local TCP stand-in for an APRS-IS server or a KISS TCP TNC.  Records every text line (APRS-IS) or decoded AX.25 frame (kiss=True) it receives in self.frames, can send server output to connected clients, and can drop them to exercise reconnects."""
+    
+    def __init__(self, kiss=False, greeting=None):
+        """Starts the server on a free localhost port in a daemon thread.  greeting is sent to each client on connect, like the APRS-IS banner."""
+        self.kiss = kiss
+        self.frames = []
+        self.connections = 0
+        self.clients = []
+        server = self
+        
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                server.connections += 1
+                server.clients.append(self.request)
+                if greeting:
+                    self.request.sendall(greeting)
+                buffer = b''
+                while True:
+                    try:
+                        data = self.request.recv(4096)
+                    except OSError:
+                        break
+                    if not data:
+                        break
+                    buffer += data
+                    if server.kiss:
+                        frames, buffer = decodeKISS(buffer)
+                    else:
+                        *frames, buffer = buffer.split(b'\r\n')
+                        frames = [f.decode('ascii', 'replace') for f in frames]
+                    server.frames.extend(frames)
+                server.clients.remove(self.request)
+        
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self.tcpd = socketserver.ThreadingTCPServer(('127.0.0.1', 0), Handler)
+        self.tcpd.daemon_threads = True
+        self.host, self.port = self.tcpd.server_address
+        threading.Thread(target=self.tcpd.serve_forever, daemon=True).start()
+    
+    def broadcast(self, data):
+        """Send raw bytes to every connected client."""
+        for client in list(self.clients):
+            client.sendall(data)
+    
+    def drop(self):
+        """Disconnect every client, as a restarting server would."""
+        for client in list(self.clients):
+            try:
+                client.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass        # Already closed by the client.
+    
+    def close(self):
+        """Stop the server."""
+        self.drop()
+        self.tcpd.shutdown()
+        self.tcpd.server_close()
+
+class StageTimer:
+    """Collects wall time per named pipeline stage."""
+    
+    def __init__(self):
+        self.stages = {}
+    
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = round(time.perf_counter() - start, 6)
+
+def getPeakRSS():
+    """Return the peak resident set size of this process in MiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def runSize(entries, zones_per=8, polygon_points=20):
+    """Benchmark every pipeline stage against one synthetic feed size.  Runs in a worker process so peak RSS is measured per size."""
+    import aprsnws, cap, zones, bulletin, alertstate, spool
+    import lxml.etree as et
+    
+    work = tempfile.mkdtemp(prefix='aprsnws-bench-')
+    feed = makeFeed(entries, zones_per, polygon_points)
+    with open(os.path.join(work, 'bench.xml'), 'wb') as f:
+        f.write(feed)
+    server = FeedServer(work)
+    timer = StageTimer()
+    result = {'entries': entries, 'zones_per_entry': zones_per, 'polygon_points': polygon_points, 'feed_bytes': len(feed)}
+    
+    try:
+        session = aprsnws.requests.Session()
+        with timer.stage('fetch'):
+            body = session.get(aprsnws.makeFeedUrl('bench', server.url)).content
+        with timer.stage('parse'):
+            tree = et.parse(io.BytesIO(body))
+        with timer.stage('snapshot'):
+            records = aprsnws.parseSnapshot(tree)
+        with timer.stage('stream'):
+            streamed = sum(1 for r in aprsnws.iterAlertRecords(io.BytesIO(body)))
+        
+        x = aprsnws.XMLHandler()
+        x.snapshot = records
+        with timer.stage('getters'):
+            for e in range(1, len(records) + 1):
+                x.getEntryEventGeocodeValue(e); x.getEntryEventType(e); x.getEntryEventMessageType(e)
+                x.getEntryEventSeverity(e); x.getEntryEventCertainty(e); x.getEntryEventUrgency(e)
+                x.getEntryEventCategory(e); x.getEntryEventEffective(e); x.getEntryEventExpires(e)
+        with timer.stage('cap'):
+            for r in records:
+                cap.makeEventType([r.event]); cap.makeAlertType([r.msgType]); cap.makeSeverity([r.severity])
+                cap.makeCertainty([r.certainty]); cap.makeUrgency([r.urgency]); cap.makeCategory([r.category])
+                cap.makeEffectiveStart(r.effective); cap.makeEffectiveEnd(r.expires)
+        with timer.stage('zonetext'):
+            for r in records:
+                for z in r.geocodes:
+                    zones.makeZoneText(z)
+        m = aprsnws.MsgHandler()
+        with timer.stage('msghandler'):
+            for r in records:
+                wxmsg = m.makeWxMsgPacket(cap.makeEventType([r.event]), 'ALRT', 'SEV', 'LIK', 'EXP', 'MET', '14/1800', '15/2200')
+                for z in r.geocodes:
+                    m.appendMsgId(f':{m.makeToCall(z)}:{zones.makeZoneText(z)} ' + wxmsg)
+        f = bulletin.BulletinFormatter()
+        with timer.stage('format'):
+            packets = sum(len(p) for r, p in f.renderSnapshot(records))
+        
+        before = aprsnws.FETCH_COUNT
+        poller = aprsnws.AlertPoller(('bench',), url=server.url)
+        state = alertstate.AlertState(os.path.join(work, 'state.json'))
+        queue = spool.AlertSpool(os.path.join(work, 'spool.db'))
+        with contextlib.redirect_stdout(io.StringIO()):
+            with timer.stage('main'):
+                aprsnws.main(poller, state, queue)
+        result['requests_per_cycle'] = aprsnws.FETCH_COUNT - before
+        result['packets'] = packets
+        result['spooled'] = queue.depth()
+        result['streamed_entries'] = streamed
+        result['stages'] = timer.stages
+        result['packets_per_second'] = round(packets / timer.stages['format'], 1) if timer.stages['format'] else None
+        result['main_packets_per_second'] = round(queue.depth() / timer.stages['main'], 1) if timer.stages['main'] else None
+        result['peak_rss_mib'] = getPeakRSS()
+        queue.close()
+        poller.close()
+        return result
+    
+    finally:
+        server.close()
+
+def replayFixtures(root=FIXTURES, locales=('nm',)):
+    """Poll saved api.weather.gov pages (by default the synthetic fixtures) from a local FeedServer through the GeoJSON adapter, following their cursor links.  Returns (records, packets, requests made)."""
+    import aprsnws, bulletin
+    
+    server = FeedServer(root)
+    try:
+        poller = aprsnws.AlertPoller(locales, adapter=aprsnws.GeoJSONAdapter(server.api_url))
+        records = poller.poll()
+        poller.close()
+        packets = [p for r, rendered in bulletin.BulletinFormatter().renderSnapshot(records) for p in rendered]
+        return records, packets, server.requests
+    
+    finally:
+        server.close()
+
+def runBenchmarks(sizes=SIZES, zones_per=8, polygon_points=20):
+    """Benchmark each feed size in its own process and return the machine-readable results."""
+    results = {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()), 'python': platform.python_version(),
+               'platform': platform.platform(), 'runs': []}
+    for size in sizes:
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            results['runs'].append(pool.submit(runSize, size, zones_per, polygon_points).result())
+    return results
+
+def compareResults(old, new, threshold=0.2):
+    """Compare two result sets stage by stage.  Returns a list of (entries, stage, old seconds, new seconds) for every stage that got more than threshold slower."""
+    regressions = []
+    previous = {r['entries']: r for r in old.get('runs', [])}
+    
+    for run in new.get('runs', []):
+        base = previous.get(run['entries'])
+        if base is None:
+            continue
+        for stage, seconds in run['stages'].items():
+            was = base['stages'].get(stage)
+            if was and seconds > was * (1 + threshold):
+                regressions.append((run['entries'], stage, was, seconds))
+    return regressions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Offline APRS-NWS pipeline benchmark against synthetic CAP ATOM feeds.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(SIZES), help='feed sizes in entries')
+    parser.add_argument('--zones', type=int, default=8, help='maximum zones per entry')
+    parser.add_argument('--polygon', type=int, default=20, help='points per polygon (0 for none)')
+    parser.add_argument('--out', default=RESULTS_PATH, help='where to write JSON results')
+    parser.add_argument('--compare', help='previous results file to check for regressions')
+    parser.add_argument('--fixtures', nargs='?', const=FIXTURES, help='instead of benchmarking, replay saved api.weather.gov pages (default: the synthetic fixtures/api) and print the bulletins')
+    args = parser.parse_args()
+    
+    if args.fixtures:
+        records, packets, count = replayFixtures(args.fixtures)
+        for packet in packets:
+            print(packet)
+        print(f'{len(records)} alerts, {len(packets)} packets from {count} requests.')
+        sys.exit(0 if records else 1)
+    
+    results = runBenchmarks(args.sizes, args.zones, args.polygon)
+    with open(args.out, 'w') as f:
+        json.dump(results, f, indent=2)
+    
+    for run in results['runs']:
+        stages = '  '.join(f'{k}={v * 1000:.1f}ms' for k, v in run['stages'].items())
+        print(f"{run['entries']:>6} entries  {run['requests_per_cycle']} req/cycle  {run['packets_per_second']} pkt/s  {run['peak_rss_mib']} MiB  {stages}")
+    
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compareResults(json.load(f), results)
+        for entries, stage, was, now in regressions:
+            print(f'REGRESSION {entries} entries {stage}: {was * 1000:.1f}ms -> {now * 1000:.1f}ms')
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,171 @@
+#!/usr/bin/python3
+
+# APRS-NWS
+# Copyright 2021, Kurt Kochendarfer (KE7KUS)
+
+# ===GNU Public License v3===
+# This file is part of APRS-NWS.
+
+# APRS-NWS is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License 
+# as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+# APRS-NWS is distributed in the hope that it will be useful,but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License along with APRS-NWS.  If not, see <https://www.gnu.org/licenses/>.
+
+#-----IMPORTS-----#
+import re, sys, time, zlib
+import cap, zones
+
+#-----GLOBALS-----#
+# Fixed-width field tables for the APRS-NWS bulletin layout (see README).  Padded once at import so rendering is a dict lookup per field.
+EVENTTYPE = {k: v[:10].ljust(10) for k, v in cap.EVENTTYPE.items()}
+ALERTTYPE = {k: v[:4].ljust(4) for k, v in cap.ALERTTYPE.items()}
+SEVERITY = {k: v[:3].ljust(3) for k, v in cap.SEVERITY.items()}
+CERTAINTY = {k: v[:3].ljust(3) for k, v in cap.CERTAINTY.items()}
+URGENCY = {k: v[:3].ljust(3) for k, v in cap.URGENCY.items()}
+CATEGORY = {k: v[:4].ljust(4) for k, v in cap.CATEGORY.items()}
+
+BODY_LEN = 50           # *EVENT TYPE* TYPE SEV-CER-URG CATG DD/HHMM-DD/HHMM
+ZONETEXT_LEN = 15       # Also the room available for a packed UGC zone list.
+TEXT_LEN = 67           # Maximum APRS message text length (ZONETEXT, space and body).
+
+# Byte layout of a complete bulletin as documented in the README table.
+PACKET_LAYOUT = re.compile(r':(?:[A-Z0-9]{6}   |[A-Z]{2}[ZC]      ):[ -~]{15} \*[ -~]{10}\* [A-Z ]{4} [A-Z ]{3}-[A-Z ]{3}-[A-Z ]{3} [A-Z ]{4} '
+                           r'(?:\d\d/\d{4}|--/----)-(?:\d\d/\d{4}|--/----)(\{[0-9A-Za-z]{1,5})?')
+
+def makeField(table, value, width):
+    """Return the fixed-width abbreviation for a CAP value, falling back to cap.makeCode for anything not in the table."""
+    field = table.get(value)
+    return field if field is not None else cap.makeCode(table, value, width)
+
+def makeUGCRuns(numbers):
+    """Collapse sorted zone numbers into runs of consecutive numbers, e.g. [201, 208, 209, 210] -> [(201, 201), (208, 210)]."""
+    runs = []
+    for n in numbers:
+        if runs and n == runs[-1][1] + 1:
+            runs[-1] = (runs[-1][0], n)
+        else:
+            runs.append((n, n))
+    return runs
+
+def makeUGCItem(run):
+    """Format one run in UGC notation: 'NNN' for a single zone, 'NNN>MMM' for a range."""
+    return f'{run[0]:03d}' if run[0] == run[1] else f'{run[0]:03d}>{run[1]:03d}'
+
+def packZones(geocodes, width=ZONETEXT_LEN):
+    """Pack UGC codes into as few compact UGC strings of at most width characters as possible, in the style of NWS products (e.g. 'NMZ201-208>212').  Codes sharing a state/type prefix are grouped; runs that do not fit are split.  Codes that are not in SSZnnn/SSCnnn form cannot be ranged and get a single-zone group of their own.  Returns a list of (prefix, ugc string, zones) tuples."""
+    groups, packed = {}, []
+    for zone in geocodes:
+        if len(zone) == 6 and zone[3:6].isdigit():
+            groups.setdefault(zone[:3], set()).add(int(zone[3:6]))
+        else:
+            packed.append((zone[:3], zone, [zone]))
+    
+    for prefix in sorted(groups):
+        text, zones = prefix, []
+        runs = makeUGCRuns(sorted(groups[prefix]))
+        while runs:
+            run = runs.pop(0)
+            item = makeUGCItem(run)
+            sep = '-' if zones else ''
+            if len(text) + len(sep) + len(item) <= width:
+                text += sep + item
+                zones.extend(f'{prefix}{n:03d}' for n in range(run[0], run[1] + 1))
+                continue
+            if run[0] != run[1] and len(text) + len(sep) + 3 <= width:
+                runs.insert(0, (run[0] + 1, run[1]))
+                runs.insert(0, (run[0], run[0]))
+                continue
+            packed.append((prefix, text, zones))
+            text, zones = prefix, []
+            runs.insert(0, run)
+        if zones:
+            packed.append((prefix, text, zones))
+    return packed
+
+def makeMsgId(msg):
+    """Return a 5-digit APRS message ID derived from the CRC-32 of the bulletin text.  Unlike hash(), the ID is the same in every process, so a restart (or a second instance) sends identical bulletins with identical IDs and client radios suppress the duplicates."""
+    return f'{zlib.crc32(msg.encode()) % 100000:05d}'
+
+def appendMsgId(msg):
+    """Append a 5-byte APRS message ID to a bulletin.  Matches MsgHandler.appendMsgId."""
+    return msg + '{' + makeMsgId(msg)
+
+#-----CLASSES-----#
+class BulletinFormatter:
+    """Batch renderer for APRS-NWS bulletins.  The 50-byte alert body is rendered once per alert and then stamped out per zone by prefixing the address and ZONETEXT, since the body is identical for every zone of an entry."""
+    
+    def __init__(self, zonetext=zones.makeZoneText, appendId=appendMsgId, pack=False):
+        """Initializes the formatter with the ZONETEXT lookup and message ID function to use.  With pack=True the zones of each alert are packed into as few packets as possible (see renderPackedPackets)."""
+        self.zonetext = zonetext
+        self.appendId = appendId
+        self.pack = pack
+        self.invalid = 0
+        self.savings = []
+    
+    def renderBody(self, record):
+        """Render the bulletin body for one AlertRecord."""
+        return (f'*{makeField(EVENTTYPE, record.event, 10)}* {makeField(ALERTTYPE, record.msgType, 4)} '
+                f'{makeField(SEVERITY, record.severity, 3)}-{makeField(CERTAINTY, record.certainty, 3)}-{makeField(URGENCY, record.urgency, 3)} '
+                f'{makeField(CATEGORY, record.category, 4)} {cap.makeDTG(record.effective)}-{cap.makeDTG(record.expires)}')
+    
+    def stampPacket(self, tocall, text, body, packets):
+        """Assemble, ID and validate one packet, appending it to packets.  Packets that do not match the documented byte layout are counted in self.invalid and dropped."""
+        packet = self.appendId(f':{tocall:<9}:{text} {body}')
+        if self.validatePacket(packet):
+            packets.append(packet)
+        else:
+            self.invalid += 1
+            print(f'Invalid bulletin layout, dropped: {packet}')
+    
+    def renderPackets(self, record, body=None):
+        """Render one packet per geocode of an AlertRecord, or packed packets if the formatter was created with pack=True."""
+        if self.pack:
+            return self.renderPackedPackets(record, body)
+        
+        body = body or self.renderBody(record)
+        packets = []
+        for zone in record.geocodes:
+            self.stampPacket(zone[:6], self.zonetext(zone), body, packets)
+        return packets
+    
+    def renderPackedPackets(self, record, body=None):
+        """Render an alert's zones packed into as few packets as possible.  Each packet is addressed to the shared state/type prefix (e.g. NMZ, matching NMZ* filters) and carries a compact UGC list in the ZONETEXT field; a group holding a single zone keeps the normal zone address and ZONETEXT.  Records (alert ID, zones, packets) in self.savings."""
+        body = body or self.renderBody(record)
+        packets = []
+        
+        for prefix, ugc, group in packZones(record.geocodes):
+            if len(group) == 1:
+                self.stampPacket(group[0][:6], self.zonetext(group[0]), body, packets)
+            else:
+                self.stampPacket(prefix, ugc.ljust(ZONETEXT_LEN), body, packets)
+        self.savings.append((record.id, len(record.geocodes), len(packets)))
+        return packets
+    
+    def renderSnapshot(self, records):
+        """Render a whole snapshot in one call.  Returns a list of (AlertRecord, packets) pairs in feed order."""
+        self.savings = []
+        return [(record, self.renderPackets(record)) for record in records]
+    
+    def validatePacket(self, packet):
+        """Return True if packet matches the APRS-NWS bulletin byte layout and the message text fits the APRS 67-byte limit."""
+        return PACKET_LAYOUT.fullmatch(packet) is not None and len(packet.split('{')[0]) - 11 <= TEXT_LEN
+
+def benchmark(count=1000, zones_per=10):
+    """Micro-benchmark the formatter on count synthetic alerts of zones_per zones each.  Returns packets rendered per second."""
+    from aprsnws import AlertRecord
+    
+    records = [AlertRecord(id=str(n), published='', updated='', event='Winter Storm Warning', status='Actual', msgType='Alert',
+                           severity='Severe', certainty='Likely', urgency='Expected', category='Met',
+                           effective='2021-01-14T19:00:00-07:00', expires='2021-01-15T22:00:00-07:00', polygon='', areaDesc='',
+                           geocodes=tuple(f'NMZ{201 + z:03d}' for z in range(zones_per))) for n in range(count)]
+    f = BulletinFormatter()
+    start = time.perf_counter()
+    packets = sum(len(p) for r, p in f.renderSnapshot(records))
+    return packets / (time.perf_counter() - start)
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    print(f'{benchmark(count):.0f} packets/second')
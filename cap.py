@@ -14,55 +14,77 @@
 
 # You should have received a copy of the GNU General Public License along with APRS-NWS.  If not, see <https://www.gnu.org/licenses/>.
 
-def makeEventType(event, default = 'N/A'):
+#-----IMPORTS-----#
+import re, datetime
+
+#-----GLOBALS-----#
+# CAP/NWS value -> APRS-NWS abbreviation lookup tables.  Built once at import rather than on every call.
+EVENTTYPE = {'911 Telephone Outage':'911TEL OUT','Administrative Message':'ADMIN MSG','Air Quality Alert':'ARQUAL ALT','Air Stagnation Advisory':'ARSTAG ADV','Ashfall Advisory':'ASHFALL ADV','Ashfall Warning':'ASHFALL WRN','Avalanche Warning':'AVLNCH WRN','Avalanche Watch':'AVLNCH WCH','Beach Hazards Statement':'BCHHAZ STM','Blizzard Warning':'BLZZRD WRN','Blizzard Watch':'BLZZRD WCH','Blowing Dust Advisory':'BLWDST ADV','Blowing Snow Advisory':'BLWSNO ADV','Brisk Wind Advisory':'BSKWND ADV','Child Abduction Emergency':'!AMBERALT!','Civil Danger Warning':'CIVDAN WRN','Civil Emergency Message':'CIVEMR MSG','Coastal Flood Advisory':'CSTFLD ADV','Coastal Flood Statement':'CSTFLD STM','Coastal Flood Warning':'CSTFLD WRN','Coastal Flood Watch':'CSTFLD WCH','Dense Fog Advisory':'DNSFOG ADV','Dense Smoke Advisory':'DNSMOK ADV','Dust Storm Warning':'DSTORM WRN','Earthquake Warning':'ERTHQK WRN','Evacuation Immediate':'EVACUATE  ','Excessive Heat Warning':'EXHEAT WRN','Excessive Heat Watch':'EXHEAT WCH','Extreme Cold Warning':'EXCOLD WRN','Extreme Cold Watch':'EXCOLD WCH','Extreme Fire Danger':'EXFIRE DGR','Extreme Wind Warning':'EXWIND WRN','Fire Warning':'FIRE WARN ','Fire Weather Watch':'FIREWX WCH','Flash Flood Statement':'FLSHFD STM','Flash Flood Warning':'FLSHFD WRN','Flash Flood Watch':'FLSHFD WCH','Flood Advisory':'FLOOD ADV ','Flood Statement':'FLOOD STMT','Flood Warning':'FLOOD WARN','Flood Watch':'FLOOD WTCH','Freeze Warning':'FREEZE WRN','Freeze Watch':'FREEZE WCH','Freezing Drizzle Advisory':'FRZDRZ ADV','Freezing Fog Advisory':'FRZFOG ADV','Freezing Rain Advisory':'FRZRN ADV ','Freezing Spray Advisory':'FRZSPR ADV','Frost Advisory':'FROST ADV ','Gale Warning':'GALE WARN ','Gale Watch':'GALE WATCH','Hard Freeze Warning':'HRDFRZ WRN','Hard Freeze Watch':'HRDFRZ WCH','Hazardous Materials Warning':'HAZMAT WRN','Hazardous Seas Warning':'HAZSEA WRN','Hazardous Seas Watch':'HAZSEA WCH','Hazardous Weather Outlook':'HAZWX OTLK','Heat Advisory':'HEAT ADVSY','Heavy Freezing Spray Warning':'FRZSPR WRN','Heavy Freezing Spray Watch':'FRZSPR WCH','Heavy Snow Warning':'HVYSNO WRN','High Surf Advisory':'HISURF ADV','High Surf Warning':'HISURF WRN','High Wind Warning':'HIWIND WRN','High Wind Watch':'HIWIND WCH','Hurricane Force Wind Warning':'HURWND WRN','Hurricane Force Wind Watch':'HURWND WCH','Hurricane Statement':'HURRCN STM','Hurricane Warning':'HURRCN WRN','Hurricane Watch':'HURRCN WCH','Hurricane Wind Warning':'HURWND WRN','Hurricane Wind Watch':'HURWND WCH','Hydrologic Advisory':'HYDRO ADV ','Hydrologic Outlook':'HYDRO OTLK','Ice Storm Warning':'ICESTM WRN','Lake Effect Snow Advisory':'LAKSNO ADV','Lake Effect Snow and Blowing Snow Advisory':'LAKSNO ADV','Lake Effect Snow Warning':'LAKSNO WRN','Lake Effect Snow Watch':'LAKSNO WCH','Lakeshore Flood Advisory':'LAKFLD ADV','Lakeshore Flood Statement':'LAKFLD STM','Lakeshore Flood Warning':'LAKFLD WRN','Lakeshore Flood Watch':'LAKFLD WCH','Lake Wind Advisory':'LAKWND ADV','Law Enforcement Warning':'LAWENF WRN','Local Area Emergency':'LOCAL EMR','Low Water Advisory':'LOWH2O ADV','Marine Weather Statement':'MARWX STMT','Nuclear Power Plant Warning':'NUKPLT WRN','Radiological Hazard Warning':'RADHAZ WRN','Red Flag Warning':'REDFLG WRN','Rip Current Statement':'RIPCUR STM','Severe Thunderstorm Warning':'SVTSTM WRN','Severe Thunderstorm Watch':'SVTSTM WCH','Severe Weather Statement':'SVRWX STMT','Shelter In Place Warning':'SHLTIP WRN','Sleet Advisory':'SLEET ADV ','Sleet Warning':'SLEET WRN ','Small Craft Advisory':'SMCRFT ADV','Snow Advisory':'SNOW ADV  ','Snow and Blowing Snow Advisory':'BLWSNO ADV','Special Marine Warning':'SPCMAR WRN','Special Weather Statement':'SPECWX STM','Storm Warning':'STORM WARN','Storm Watch':'STORM WTCH','Test':'TEST  TEST','Tornado Warning':'TORNDO WRN','Tornado Watch':'TORNDO WCH','Tropical Storm Warning':'TPCSTM WRN','Tropical Storm Watch':'TPCSTM WCH','Tropical Storm Wind Warning':'TPCWND WRN','Tropical Storm Wind Watch':'TPCWND WCH','Tsunami Advisory':'TSUNMI ADV','Tsunami Warning':'TSUNMI WRN','Tsunami Watch':'TSUNMI WCH','Typhoon Statement':'TYPHUN STM','Typhoon Warning':'TYPHUN WRN','Typhoon Watch':'TYPHUN WCH','Volcano Warning':'VOLCNO WRN','Wind Advisory':'WIND ADVSY','Wind Chill Advisory':'WNDCHL ADV','Wind Chill Warning':'WNDCHL WRN','Wind Chill Watch':'WNDCHL WCH','Winter Storm Warning':'WTRSTM WRN','Winter Storm Watch':'WTRSTM WCH','Winter Weather Advisory':'WNTRWX ADV'}
+ALERTTYPE = {'Alert':'ALRT','Update':'UPDT','Cancel':'CANX','Ack':'ACK ','Error':'ERR '}
+SEVERITY = {'Extreme':'EXT','Severe':'SEV','Moderate':'MOD','Minor':'MIN','Unknown':'UNK'}
+CERTAINTY = {'Observed':'OBS','Likely':'LIK','Possible':'POS','Unlikely':'ULK','Unknown':'UNK'}
+URGENCY = {'Immediate':'IMM','Expected':'EXP','Future':'FUT','Past':'PST','Unknown':'UNK'}
+CATEGORY = {'Geo':'GEO','Met':'MET','Safety':'SFTY','Security':'SECU','Rescue':'RESC','Fire':'FIRE','Health':'HLTH','Env':'ENV','Transport':'TRAN','Infra':'INFR','CBRNE':'CBRN','Other':'OTHR'}
+
+UNKNOWN = 'UNK'         # Field text for an empty CAP value.
+MISSING_DTG = '--/----' # DD/HHMM placeholder for a missing or unparseable DTG.
+DTG_PATTERN = re.compile(r'\d{4}-\d\d-(\d\d)T(\d\d):(\d\d)')
+
+def makeCode(table, value, width):
+    """Look up value in a CAP abbreviation table and return it padded to the field width.  Values missing from the table (e.g. event types added by the NWS after this table was written) fall back to the upper-cased value, reduced to letters and spaces so the bulletin layout stays valid, rather than raising KeyError; an empty value gives UNK."""
+    code = table.get(value)
+    if code is None:
+        code = re.sub('[^A-Z ]', '', (value or '').upper()).strip() or UNKNOWN
+    return code[:width].ljust(width)
+
+def makeEventType(event, default = UNKNOWN):
     """Convert NWS forecast event type into 10-byte human-readable event type descriptor.  Dictionary comforms to the CAP v1.1 standard as implemented by the US National Weather Service.  For a list of current event types, see <https://alerts.weather.gov/cap/product_list.txt>."""
     
-    et = {'911 Telephone Outage':'911TEL OUT','Administrative Message':'ADMIN MSG','Air Quality Alert':'ARQUAL ALT','Air Stagnation Advisory':'ARSTAG ADV','Ashfall Advisory':'ASHFALL ADV','Ashfall Warning':'ASHFALL WRN','Avalanche Warning':'AVLNCH WRN','Avalanche Watch':'AVLNCH WCH','Beach Hazards Statement':'BCHHAZ STM','Blizzard Warning':'BLZZRD WRN','Blizzard Watch':'BLZZRD WCH','Blowing Dust Advisory':'BLWDST ADV','Blowing Snow Advisory':'BLWSNO ADV','Brisk Wind Advisory':'BSKWND ADV','Child Abduction Emergency':'!AMBERALT!','Civil Danger Warning':'CIVDAN WRN','Civil Emergency Message':'CIVEMR MSG','Coastal Flood Advisory':'CSTFLD ADV','Coastal Flood Statement':'CSTFLD STM','Coastal Flood Warning':'CSTFLD WRN','Coastal Flood Watch':'CSTFLD WCH','Dense Fog Advisory':'DNSFOG ADV','Dense Smoke Advisory':'DNSMOK ADV','Dust Storm Warning':'DSTORM WRN','Earthquake Warning':'ERTHQK WRN','Evacuation Immediate':'EVACUATE  ','Excessive Heat Warning':'EXHEAT WRN','Excessive Heat Watch':'EXHEAT WCH','Extreme Cold Warning':'EXCOLD WRN','Extreme Cold Watch':'EXCOLD WCH','Extreme Fire Danger':'EXFIRE DGR','Extreme Wind Warning':'EXWIND WRN','Fire Warning':'FIRE WARN ','Fire Weather Watch':'FIREWX WCH','Flash Flood Statement':'FLSHFD STM','Flash Flood Warning':'FLSHFD WRN','Flash Flood Watch':'FLSHFD WCH','Flood Advisory':'FLOOD ADV ','Flood Statement':'FLOOD STMT','Flood Warning':'FLOOD WARN','Flood Watch':'FLOOD WTCH','Freeze Warning':'FREEZE WRN','Freeze Watch':'FREEZE WCH','Freezing Drizzle Advisory':'FRZDRZ ADV','Freezing Fog Advisory':'FRZFOG ADV','Freezing Rain Advisory':'FRZRN ADV ','Freezing Spray Advisory':'FRZSPR ADV','Frost Advisory':'FROST ADV ','Gale Warning':'GALE WARN ','Gale Watch':'GALE WATCH','Hard Freeze Warning':'HRDFRZ WRN','Hard Freeze Watch':'HRDFRZ WCH','Hazardous Materials Warning':'HAZMAT WRN','Hazardous Seas Warning':'HAZSEA WRN','Hazardous Seas Watch':'HAZSEA WCH','Hazardous Weather Outlook':'HAZWX OTLK','Heat Advisory':'HEAT ADVSY','Heavy Freezing Spray Warning':'FRZSPR WRN','Heavy Freezing Spray Watch':'FRZSPR WCH','Heavy Snow Warning':'HVYSNO WRN','High Surf Advisory':'HISURF ADV','High Surf Warning':'HISURF WRN','High Wind Warning':'HIWIND WRN','High Wind Watch':'HIWIND WCH','Hurricane Force Wind Warning':'HURWND WRN','Hurricane Force Wind Watch':'HURWND WCH','Hurricane Statement':'HURRCN STM','Hurricane Warning':'HURRCN WRN','Hurricane Watch':'HURRCN WCH','Hurricane Wind Warning':'HURWND WRN','Hurricane Wind Watch':'HURWND WCH','Hydrologic Advisory':'HYDRO ADV ','Hydrologic Outlook':'HYDRO OTLK','Ice Storm Warning':'ICESTM WRN','Lake Effect Snow Advisory':'LAKSNO ADV','Lake Effect Snow and Blowing Snow Advisory':'LAKSNO ADV','Lake Effect Snow Warning':'LAKSNO WRN','Lake Effect Snow Watch':'LAKSNO WCH','Lakeshore Flood Advisory':'LAKFLD ADV','Lakeshore Flood Statement':'LAKFLD STM','Lakeshore Flood Warning':'LAKFLD WRN','Lakeshore Flood Watch':'LAKFLD WCH','Lake Wind Advisory':'LAKWND ADV','Law Enforcement Warning':'LAWENF WRN','Local Area Emergency':'LOCAL EMR','Low Water Advisory':'LOWH2O ADV','Marine Weather Statement':'MARWX STMT','Nuclear Power Plant Warning':'NUKPLT WRN','Radiological Hazard Warning':'RADHAZ WRN','Red Flag Warning':'REDFLG WRN','Rip Current Statement':'RIPCUR STM','Severe Thunderstorm Warning':'SVTSTM WRN','Severe Thunderstorm Watch':'SVTSTM WCH','Severe Weather Statement':'SVRWX STMT','Shelter In Place Warning':'SHLTIP WRN','Sleet Advisory':'SLEET ADV ','Sleet Warning':'SLEET WRN ','Small Craft Advisory':'SMCRFT ADV','Snow Advisory':'SNOW ADV  ','Snow and Blowing Snow Advisory':'BLWSNO ADV','Special Marine Warning':'SPCMAR WRN','Special Weather Statement':'SPECWX STM','Storm Warning':'STORM WARN','Storm Watch':'STORM WTCH','Test':'TEST  TEST','Tornado Warning':'TORNDO WRN','Tornado Watch':'TORNDO WCH','Tropical Storm Warning':'TPCSTM WRN','Tropical Storm Watch':'TPCSTM WCH','Tropical Storm Wind Warning':'TPCWND WRN','Tropical Storm Wind Watch':'TPCWND WCH','Tsunami Advisory':'TSUNMI ADV','Tsunami Warning':'TSUNMI WRN','Tsunami Watch':'TSUNMI WCH','Typhoon Statement':'TYPHUN STM','Typhoon Warning':'TYPHUN WRN','Typhoon Watch':'TYPHUN WCH','Volcano Warning':'VOLCNO WRN','Wind Advisory':'WIND ADVSY','Wind Chill Advisory':'WNDCHL ADV','Wind Chill Warning':'WNDCHL WRN','Wind Chill Watch':'WNDCHL WCH','Winter Storm Warning':'WTRSTM WRN','Winter Storm Watch':'WTRSTM WCH','Winter Weather Advisory':'WNTRWX ADV'}
-    return et[event[0]] if event else default
+    return makeCode(EVENTTYPE, event[0] if event else default, 10)
 
-def makeAlertType(alert, default = 'N/A'):
+def makeAlertType(alert, default = UNKNOWN):
     """Convert NWS forecast alert type into 4-byte human-readable alert type descriptor.  Dictionary conforms to the CAP v1.1 standard as implemented by the US National Weather Service.  For a list of current data types, see <https://www.oasis-open.org/committees/download.php/14759/emergency-CAPv1.1.pdf>."""    
     
-    at = {'Alert':'ALRT','Update':'UPDT','Cancel':'CANX','Ack':'ACK ','Error':'ERR '}
-    return at[alert[0]] if alert else default
+    return makeCode(ALERTTYPE, alert[0] if alert else default, 4)
 
-def makeSeverity(severity, default = 'N/A'):
+def makeSeverity(severity, default = UNKNOWN):
     """Convert NWS forecast severity into 3-byte human-readable severity descriptor.  Dictionary conforms to the CAP v1.1 standard as implemented by the US National Weather Service.  For a list of current data types, see <https://www.oasis-open.org/committees/download.php/14759/emergency-CAPv1.1.pdf>."""
     
-    sev = {'Extreme':'EXT','Severe':'SEV','Moderate':'MOD','Minor':'MIN','Unknown':'UNK'}
-    return sev[severity[0]] if severity else default
+    return makeCode(SEVERITY, severity[0] if severity else default, 3)
 
-def makeCertainty(certainty, default = 'N/A'):
+def makeCertainty(certainty, default = UNKNOWN):
     """Convert NWS forecast certainty into a 3-byte human-readable certainty descriptor.  Dictionary conforms to the CAP v1.1 standard as implemented by the US National Weather Service.  For a list of current data types, see <https://www.oasis-open.org/committees/download.php/14759/emergency-CAPv1.1.pdf>."""
     
-    cer = {'Observed':'OBS','Likely':'LIK','Possible':'POS','Unlikely':'ULK','Unknown':'UNK'}
-    return cer[certainty[0]] if certainty else default
+    return makeCode(CERTAINTY, certainty[0] if certainty else default, 3)
 
-def makeUrgency(urgency, default = 'N/A'):
+def makeUrgency(urgency, default = UNKNOWN):
     """Convert NWS forecast urgency into 3-byte human-readable urgency descriptor.  Dictionary conforms to the CAP v1.1 standard as implemented by the US National Weather Service.  For a list of current data types, see <https://www.oasis-open.org/committees/download.php/14759/emergency-CAPv1.1.pdf>."""
     
-    urg = {'Immediate':'IMM','Expected':'EXP','Future':'FUT','Past':'PST','Unknown':'UNK'}
-    return urg[urgency[0]] if urgency else default
+    return makeCode(URGENCY, urgency[0] if urgency else default, 3)
 
-def makeCategory(category, default = 'N/A'):
+def makeCategory(category, default = UNKNOWN):
     """Convert NWS forecast category into 4-byte human-readable category descriptor.  Dictionary conforms to the CAP v1.1 standard as implemented by the US National Weather Service.  For a list of current data types, see <https://www.oasis-open.org/committees/download.php/14759/emergency-CAPv1.1.pdf>."""
 
-    cat = {'Geo':'GEO','Met':'MET','Safety':'SFTY','Security':'SECU','Rescue':'RESC','Fire':'FIRE','Health':'HLTH','Env':'ENV','Transport':'TRAN','Infra':'INFR','CBRNE':'CBRN','Other':'OTHR'}
-    return cat[category[0]] if category else default
+    return makeCode(CATEGORY, category[0] if category else default, 4)
+
+def makeDTG(dtg):
+    """Convert an NWS DTG ('YYYY-MM-DDTHH:MM:SS+HH:MM') to the 7-byte DD/HHMM format in UTC, so start and end times from offices in different time zones share one time base.  DTGs that cannot be parsed fall back to slicing the local time, and missing ones to --/----."""
+    try:
+        utc = datetime.datetime.fromisoformat(dtg).astimezone(datetime.timezone.utc)
+        return utc.strftime('%d/%H%M')
+    
+    except (TypeError, ValueError):
+        match = DTG_PATTERN.match(dtg or '')
+        return f'{match[1]}/{match[2]}{match[3]}' if match else MISSING_DTG
 
 def makeEffectiveStart(dtg):
-    """Convert NWS forecast DTG to an abbreviated date/time human-readable format.  Uses the raw NWS feed time format 'YYYY-MM-DDTHH:MM:SSZZZ:ZZ' where ZZZ:ZZ is the UTC time offset in HH:MM and the first character is +/- based on shift from UTC."""
+    """Convert NWS forecast DTG to an abbreviated date/time human-readable format.  Uses the raw NWS feed time format 'YYYY-MM-DDTHH:MM:SSZZZ:ZZ' where ZZZ:ZZ is the UTC time offset in HH:MM and the first character is +/- based on shift from UTC.  The result is in UTC."""
     
-    start = dtg[8:10] + '/' + dtg[11:13] + dtg[14:16]
+    start = makeDTG(dtg)
     return start
 
 def makeEffectiveEnd(dtg):
-    """Convert NWS forecast DTG to an abbreviated date/time human-readable format.  Uses the raw NWS feed time format 'YYYY-MM-DDTHH:MM:SSZZZ:ZZ' where ZZZ:ZZ is the UTC time offset in HH:MM and the first character is +/- based on shift from UTC."""
+    """Convert NWS forecast DTG to an abbreviated date/time human-readable format.  Uses the raw NWS feed time format 'YYYY-MM-DDTHH:MM:SSZZZ:ZZ' where ZZZ:ZZ is the UTC time offset in HH:MM and the first character is +/- based on shift from UTC.  The result is in UTC."""
     
-    end = dtg[8:10] + '/' + dtg[11:13] + dtg[14:16]
+    end = makeDTG(dtg)
     return end
-
-
-
-
-
@@ -0,0 +1,107 @@
+#!/usr/bin/python3
+
+# APRS-NWS
+# Copyright 2021, Kurt Kochendarfer (KE7KUS)
+
+# ===GNU Public License v3===
+# This file is part of APRS-NWS.
+
+# APRS-NWS is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License 
+# as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+# APRS-NWS is distributed in the hope that it will be useful,but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License along with APRS-NWS.  If not, see <https://www.gnu.org/licenses/>.
+
+#-----IMPORTS-----#
+import os, json, hashlib, threading
+
+#-----GLOBALS-----#
+CACHE_PATH = '/tmp/wxfeedcache.json'
+
+#-----CLASSES-----#
+class FeedCache:
+    """Persistent per-URL feed cache.  Stores the HTTP validators (ETag/Last-Modified), a content hash and the parsed records of the last good response so that unchanged feeds can be skipped without re-parsing."""
+    
+    def __init__(self, path=CACHE_PATH):
+        """Initializes the cache, loading any previously saved state from path.  A missing or unreadable cache file starts an empty cache."""
+        self.path = path
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.dirty = False
+        self._lock = threading.Lock()
+        
+        try:
+            if self.path and os.path.exists(self.path):
+                with open(self.path, 'r') as f:
+                    self.entries = json.load(f)
+        
+        except Exception as ex:
+            print(f'FeedCache Exception: {ex}')
+            self.entries = {}
+    
+    def makeDigest(self, content):
+        """Return the SHA-256 hex digest of a response body."""
+        return hashlib.sha256(content).hexdigest()
+    
+    def lookup(self, url):
+        """Return the cached records for url, or None if the URL has never been cached."""
+        entry = self.entries.get(url)
+        return entry['records'] if entry else None
+    
+    def conditionalHeaders(self, url):
+        """Build If-None-Match/If-Modified-Since request headers from the stored validators for url."""
+        entry = self.entries.get(url) or {}
+        headers = {}
+        
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+    
+    def isUnchanged(self, url, digest):
+        """Return True if digest matches the body hash stored for url."""
+        entry = self.entries.get(url)
+        return bool(entry) and entry.get('digest') == digest
+    
+    def hit(self, url, headers=None):
+        """Record a cache hit (304 or identical body), refreshing the stored validators if the server sent new ones."""
+        with self._lock:
+            self.hits += 1
+            entry = self.entries.get(url)
+            if entry and headers is not None:
+                etag = headers.get('ETag') or entry.get('etag')
+                last_modified = headers.get('Last-Modified') or entry.get('last_modified')
+                if etag != entry.get('etag') or last_modified != entry.get('last_modified'):
+                    entry['etag'] = etag
+                    entry['last_modified'] = last_modified
+                    self.dirty = True
+    
+    def store(self, url, headers, digest, records):
+        """Record a cache miss and store the validators, body hash and parsed records of a changed feed."""
+        with self._lock:
+            self.misses += 1
+            self.entries[url] = {'etag': headers.get('ETag'),
+                                 'last_modified': headers.get('Last-Modified'),
+                                 'digest': digest,
+                                 'records': records}
+            self.dirty = True
+    
+    def save(self):
+        """Write the cache to disk atomically so a crash mid-write never leaves a corrupt cache file.  Does nothing if nothing changed since the last save, so a cycle of 304s costs no serialization."""
+        if not self.path or not self.dirty:
+            return
+        
+        try:
+            tmp = self.path + '.tmp'
+            with self._lock:
+                with open(tmp, 'w') as f:
+                    json.dump(self.entries, f)
+                self.dirty = False
+            os.replace(tmp, self.path)
+        
+        except Exception as ex:
+            print(f'FeedCache save Exception: {ex}')
@@ -0,0 +1,125 @@
+#!/usr/bin/python3
+
+# APRS-NWS
+# Copyright 2021, Kurt Kochendarfer (KE7KUS)
+
+# ===GNU Public License v3===
+# This file is part of APRS-NWS.
+
+# APRS-NWS is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License 
+# as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+# APRS-NWS is distributed in the hope that it will be useful,but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License along with APRS-NWS.  If not, see <https://www.gnu.org/licenses/>.
+
+#-----IMPORTS-----#
+import numpy as np
+
+#-----GLOBALS-----#
+KM_PER_DEG_LAT = 110.574
+KM_PER_DEG_LON = 111.320    # At the equator; scaled by cos(latitude).
+CACHE_SIZE = 10000          # Parsed polygons kept between cycles, keyed by the raw cap:polygon string.
+
+def parsePolygon(text):
+    """Parse a CAP polygon string ('lat,lon lat,lon ...') into an (n, 2) float array of (lon, lat) vertices.  Returns None for empty or malformed polygons."""
+    try:
+        points = np.array([pair.split(',') for pair in text.split()], dtype=float)
+        if points.ndim != 2 or points.shape[0] < 3 or points.shape[1] != 2:
+            return None
+        return points[:, ::-1].copy()
+    
+    except (AttributeError, ValueError):
+        return None
+
+def pointsInPolygon(points, polygon):
+    """Vectorized even-odd test of many (x, y) points against one polygon.  Returns a boolean array, one per point."""
+    a = polygon
+    b = np.roll(polygon, -1, axis=0)
+    x = points[:, 0:1]
+    y = points[:, 1:2]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        crosses = ((a[:, 1] > y) != (b[:, 1] > y)) & (x < (b[:, 0] - a[:, 0]) * (y - a[:, 1]) / (b[:, 1] - a[:, 1]) + a[:, 0])
+    return crosses.sum(axis=1) % 2 == 1
+
+def edgesIntersect(p, q):
+    """Return True if any edge of polygon p properly crosses any edge of polygon q (all edge pairs tested at once)."""
+    a1, a2 = p[:, None, :], np.roll(p, -1, axis=0)[:, None, :]
+    b1, b2 = q[None, :, :], np.roll(q, -1, axis=0)[None, :, :]
+    
+    def orient(o, s, t):
+        return np.sign((s[..., 0] - o[..., 0]) * (t[..., 1] - o[..., 1]) - (s[..., 1] - o[..., 1]) * (t[..., 0] - o[..., 0]))
+    
+    return bool(np.any((orient(a1, a2, b1) != orient(a1, a2, b2)) & (orient(b1, b2, a1) != orient(b1, b2, a2))))
+
+#-----CLASSES-----#
+class GeoFilter:
+    """Tests alert polygons against our coverage footprint: either a station point plus radius, or a coverage polygon.  Polygons are parsed into NumPy arrays once and cached; a vectorized bounding-box prefilter discards distant polygons before the exact tests run."""
+    
+    def __init__(self, station=None, radius_km=None, coverage=None):
+        """Initializes the filter with a (lat, lon) station and radius in km, or a coverage polygon in CAP polygon syntax."""
+        if coverage is None and (station is None or radius_km is None):
+            raise ValueError('GeoFilter needs a station and radius, or a coverage polygon')
+        
+        self.cache = {}
+        if coverage is not None:
+            self.coverage = parsePolygon(coverage) if isinstance(coverage, str) else np.asarray(coverage, dtype=float)[:, ::-1]
+            self.station = None
+            self.radius_km = None
+            self.bbox = np.concatenate([self.coverage.min(axis=0), self.coverage.max(axis=0)])
+        else:
+            self.coverage = None
+            self.station = np.array([station[1], station[0]], dtype=float)
+            self.radius_km = float(radius_km)
+            self.kx = KM_PER_DEG_LON * np.cos(np.radians(station[0]))
+            dlon, dlat = self.radius_km / self.kx, self.radius_km / KM_PER_DEG_LAT
+            self.bbox = np.array([self.station[0] - dlon, self.station[1] - dlat, self.station[0] + dlon, self.station[1] + dlat])
+    
+    def getPolygon(self, text):
+        """Return the parsed polygon for a cap:polygon string, parsing it only the first time it is seen."""
+        polygon = self.cache.get(text)
+        if polygon is None and text not in self.cache:
+            if len(self.cache) >= CACHE_SIZE:
+                self.cache.clear()
+            polygon = self.cache[text] = parsePolygon(text)
+        return polygon
+    
+    def intersectsCircle(self, polygon):
+        """Exact test of one polygon against the station radius, in a local equirectangular projection (km)."""
+        p = (polygon - self.station) * np.array([self.kx, KM_PER_DEG_LAT])
+        if pointsInPolygon(np.zeros((1, 2)), p)[0]:
+            return True
+        a, b = p, np.roll(p, -1, axis=0)
+        d = b - a
+        t = np.clip(-(a * d).sum(axis=1) / np.maximum((d * d).sum(axis=1), 1e-12), 0, 1)
+        closest = a + t[:, None] * d
+        return bool(np.min(np.hypot(closest[:, 0], closest[:, 1])) <= self.radius_km)
+    
+    def intersectsCoverage(self, polygon):
+        """Exact test of one polygon against the coverage polygon."""
+        return bool(pointsInPolygon(polygon, self.coverage).any() or pointsInPolygon(self.coverage, polygon).any()
+                    or edgesIntersect(polygon, self.coverage))
+    
+    def intersects(self, polygons):
+        """Test a batch of parsed polygons (None entries count as intersecting, since zone-only alerts have no polygon).  Returns a boolean array."""
+        result = np.ones(len(polygons), dtype=bool)
+        index = [n for n, p in enumerate(polygons) if p is not None]
+        if not index:
+            return result
+        
+        boxes = np.array([np.concatenate([polygons[n].min(axis=0), polygons[n].max(axis=0)]) for n in index])
+        near = ((boxes[:, 0] <= self.bbox[2]) & (boxes[:, 2] >= self.bbox[0]) &
+                (boxes[:, 1] <= self.bbox[3]) & (boxes[:, 3] >= self.bbox[1]))
+        exact = self.intersectsCoverage if self.coverage is not None else self.intersectsCircle
+        for n, candidate in zip(index, near):
+            result[n] = bool(candidate) and exact(polygons[n])
+        return result
+    
+    def filter(self, records):
+        """Split AlertRecords into (inside, outside) lists by whether their polygon touches the coverage area.  Records without a polygon are always inside."""
+        polygons = [self.getPolygon(r.polygon) if r.polygon else None for r in records]
+        hits = self.intersects(polygons)
+        inside = [r for r, hit in zip(records, hits) if hit]
+        outside = [r for r, hit in zip(records, hits) if not hit]
+        return inside, outside
@@ -0,0 +1,193 @@
+#!/usr/bin/python3
+
+# APRS-NWS
+# Copyright 2021, Kurt Kochendarfer (KE7KUS)
+
+# ===GNU Public License v3===
+# This file is part of APRS-NWS.
+
+# APRS-NWS is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License 
+# as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+# APRS-NWS is distributed in the hope that it will be useful,but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License along with APRS-NWS.  If not, see <https://www.gnu.org/licenses/>.
+
+#-----IMPORTS-----#
+import os, time, signal, cProfile, threading, contextlib, http.server
+from collections import defaultdict
+
+#-----GLOBALS-----#
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+STATS_PATH = '/tmp/aprsnws.prom'
+PROFILE_DIR = '/tmp'
+
+def makeKey(name, labels):
+    """Return the hashable registry key for a metric name and its labels."""
+    return (name, tuple(sorted(labels.items())))
+
+def makeLabels(labels, extra=()):
+    """Format a label tuple in Prometheus text syntax."""
+    pairs = list(labels) + list(extra)
+    return '{' + ','.join(f'{k}="{v}"' for k, v in pairs) + '}' if pairs else ''
+
+#-----CLASSES-----#
+class NullTimer:
+    """Do-nothing context manager returned by Metrics.timer() while metrics are disabled."""
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        return False
+
+NULL_TIMER = NullTimer()
+
+class Timer:
+    """Context manager that observes its elapsed wall time into a histogram."""
+    
+    def __init__(self, metrics, name, labels):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, time.perf_counter() - self.start, **self.labels)
+        return False
+
+class Metrics:
+    """Counters, gauges and histograms for the running daemon, rendered in Prometheus text format.  While disabled every call returns immediately, so the instrumentation left in the hot path costs only a method call."""
+    
+    def __init__(self, enabled=False):
+        """Initializes an empty registry."""
+        self.enabled = enabled
+        self.counters = defaultdict(float)
+        self.gauges = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+        self._server = None
+    
+    def inc(self, name, value=1, **labels):
+        """Add value to a counter."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[makeKey(name, labels)] += value
+    
+    def set(self, name, value, **labels):
+        """Set a gauge."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.gauges[makeKey(name, labels)] = value
+    
+    def observe(self, name, value, **labels):
+        """Record one observation in a histogram."""
+        if not self.enabled:
+            return
+        key = makeKey(name, labels)
+        with self._lock:
+            h = self.histograms.get(key)
+            if h is None:
+                h = self.histograms[key] = [[0] * len(BUCKETS), 0, 0.0]
+            for n, bound in enumerate(BUCKETS):
+                if value <= bound:
+                    h[0][n] += 1
+            h[1] += 1
+            h[2] += value
+    
+    def timer(self, name, **labels):
+        """Return a context manager timing its block into the named histogram."""
+        return Timer(self, name, labels) if self.enabled else NULL_TIMER
+    
+    def render(self):
+        """Render every metric in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                lines.append(f'{name}{makeLabels(labels)} {value:g}')
+            for (name, labels), value in sorted(self.gauges.items()):
+                lines.append(f'{name}{makeLabels(labels)} {value:g}')
+            for (name, labels), (buckets, count, total) in sorted(self.histograms.items()):
+                for bound, n in zip(BUCKETS, buckets):
+                    lines.append(f'{name}_bucket{makeLabels(labels, [("le", bound)])} {n}')
+                lines.append(f'{name}_bucket{makeLabels(labels, [("le", "+Inf")])} {count}')
+                lines.append(f'{name}_sum{makeLabels(labels)} {total:g}')
+                lines.append(f'{name}_count{makeLabels(labels)} {count}')
+        return '\n'.join(lines) + '\n'
+    
+    def writeStats(self, path=STATS_PATH):
+        """Atomically write the rendered metrics to path (e.g. for the node_exporter textfile collector)."""
+        if not self.enabled or not path:
+            return
+        
+        try:
+            tmp = path + '.tmp'
+            with open(tmp, 'w') as f:
+                f.write(self.render())
+            os.replace(tmp, path)
+        
+        except Exception as ex:
+            print(f'writeStats Exception: {ex}')
+    
+    def serve(self, port, host='127.0.0.1'):
+        """Serve the rendered metrics at http://host:port/metrics from a daemon thread."""
+        metrics = self
+        
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+            
+            def do_GET(self):
+                body = metrics.render().encode('utf-8')
+                self.send_response(200 if self.path.startswith('/metrics') else 404)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+        
+        self._server = http.server.ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self._server.server_port
+
+class CycleProfiler:
+    """Dumps a cProfile of the next poll cycle on demand, e.g. after 'kill -USR1 <pid>'."""
+    
+    def __init__(self, directory=PROFILE_DIR):
+        """Initializes the profiler with the directory profiles are written to."""
+        self.directory = directory
+        self.requested = False
+    
+    def install(self, signum=signal.SIGUSR1):
+        """Request a profile of the next cycle whenever signum is received."""
+        signal.signal(signum, self.request)
+    
+    def request(self, signum=None, frame=None):
+        """Flag the next cycle for profiling."""
+        self.requested = True
+    
+    @contextlib.contextmanager
+    def cycle(self):
+        """Wrap one poll cycle; profiles it only if a profile was requested."""
+        if not self.requested:
+            yield
+            return
+        
+        self.requested = False
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            path = os.path.join(self.directory, f'aprsnws-{time.strftime("%Y%m%d-%H%M%S")}.prof')
+            profile.dump_stats(path)
+            print(f'Cycle profile written to {path}')
+
+METRICS = Metrics()
+PROFILER = CycleProfiler()
@@ -0,0 +1,88 @@
+#!/usr/bin/python3
+
+# APRS-NWS
+# Copyright 2021, Kurt Kochendarfer (KE7KUS)
+
+# ===GNU Public License v3===
+# This file is part of APRS-NWS.
+
+# APRS-NWS is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License 
+# as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+# APRS-NWS is distributed in the hope that it will be useful,but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License along with APRS-NWS.  If not, see <https://www.gnu.org/licenses/>.
+
+
+#-----IMPORTS-----#
+from urllib.parse import urljoin
+
+try:
+    import orjson
+    loads = orjson.loads
+except ImportError:
+    import json
+    loads = json.loads
+
+#-----GLOBALS-----#
+API_URL = 'https://api.weather.gov/alerts/active'
+USER_AGENT = 'APRS-NWS (https://github.com/KE7KUS/APRS-NWS)'     # api.weather.gov rejects requests without a User-Agent.
+MAX_PAGES = 50          # Safety limit on cursor pages followed per locale.
+
+#-----FUNCTIONS-----#
+def makeParams(locale, filters=None):
+    """Build the server-side query for a locale: a six-character UGC code (e.g. NMZ414) becomes a zone filter, anything else an area (state/marine area) filter.  Extra filters such as {'severity': ['Extreme', 'Severe']} are added, with lists joined by commas."""
+    locale = locale.upper()
+    params = {'zone': locale} if len(locale) == 6 and locale[2] in 'ZC' else {'area': locale}
+    
+    for key, value in (filters or {}).items():
+        params[key] = ','.join(value) if isinstance(value, (list, tuple)) else value
+    return params
+
+def makeHeaders():
+    """Request headers for api.weather.gov."""
+    return {'User-Agent': USER_AGENT, 'Accept': 'application/geo+json'}
+
+def makePolygon(geometry):
+    """Convert a GeoJSON Polygon (or the first polygon of a MultiPolygon) to CAP polygon syntax, 'lat,lon lat,lon ...'.  Returns '' for alerts without geometry."""
+    if not geometry:
+        return ''
+    
+    rings = geometry.get('coordinates') or []
+    if geometry.get('type') == 'MultiPolygon':
+        rings = rings[0] if rings else []
+    if not rings:
+        return ''
+    return ' '.join(f'{lat},{lon}' for lon, lat in rings[0])
+
+def makeAlertFields(feature):
+    """Map one GeoJSON alert feature onto the AlertRecord fields produced from a CAP ATOM entry.  references lists the IDs (in the same URL form as id) of the alerts an Update or Cancel supersedes."""
+    p = feature.get('properties') or {}
+    
+    def text(key):
+        return (p.get(key) or '').strip()
+    
+    return {'id': feature.get('id') or text('@id') or text('id'),
+            'published': text('sent'),
+            'updated': text('sent'),
+            'event': text('event'),
+            'status': text('status'),
+            'msgType': text('messageType'),
+            'severity': text('severity'),
+            'certainty': text('certainty'),
+            'urgency': text('urgency'),
+            'category': text('category'),
+            'effective': text('effective'),
+            'expires': text('expires'),
+            'polygon': makePolygon(feature.get('geometry')),
+            'areaDesc': text('areaDesc'),
+            'geocodes': tuple((p.get('geocode') or {}).get('UGC') or ()),
+            'references': tuple(ref.get('@id') or ref.get('identifier') for ref in p.get('references') or ())}
+
+def getNextUrl(page, url):
+    """Return the absolute URL of the next cursor page, or None on the last page.  Relative links are resolved against url."""
+    link = (page.get('pagination') or {}).get('next')
+    if not link or not page.get('features'):
+        return None
+    return urljoin(url, link)
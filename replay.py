@@ -0,0 +1,137 @@
+#!/usr/bin/python3
+
+# APRS-NWS
+# Copyright 2021, Kurt Kochendarfer (KE7KUS)
+
+# ===GNU Public License v3===
+# This file is part of APRS-NWS.
+
+# APRS-NWS is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License 
+# as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+# APRS-NWS is distributed in the hope that it will be useful,but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License along with APRS-NWS.  If not, see <https://www.gnu.org/licenses/>.
+
+
+#-----IMPORTS-----#
+import os, io, sys, time, tarfile, difflib, argparse
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+#-----GLOBALS-----#
+OUTPUT_DIR = 'replay_out'
+IN_FLIGHT = 4           # Archive files queued per worker; bounds memory when reading a tarball.
+
+#-----FUNCTIONS-----#
+def makeOutputName(name):
+    """Map an archive member name to its output file name, keeping any subdirectories."""
+    base, ext = os.path.splitext(name)
+    return (base if ext.lower() == '.xml' else name) + '.txt'
+
+def makeOutputPath(outdir, name):
+    """Return the path under outdir where an archive member's bulletins are written.  Raises ValueError for absolute names or names that climb out of outdir (e.g. '../x.xml' in a hostile tarball)."""
+    target = os.path.normpath(os.path.join(outdir, makeOutputName(name)))
+    root = os.path.abspath(outdir)
+    if os.path.isabs(name) or os.path.commonpath([root, os.path.abspath(target)]) != root:
+        raise ValueError(f'archive member {name!r} escapes {outdir}')
+    return target
+
+def iterArchive(path):
+    """Yield (name, source) for every saved ATOM XML file in a directory or tarball, in name order.  For a directory source is the file path so workers read it themselves; a tarball is read sequentially here and source is the file contents.  Tarball members whose names would escape the output directory are skipped."""
+    if os.path.isdir(path):
+        found = []
+        for root, dirs, files in os.walk(path):
+            for file in files:
+                if file.lower().endswith('.xml'):
+                    full = os.path.join(root, file)
+                    found.append((os.path.relpath(full, path), full))
+        yield from sorted(found)
+        return
+    
+    with tarfile.open(path, 'r:*') as tar:
+        members = sorted((m for m in tar.getmembers() if m.isfile() and m.name.lower().endswith('.xml')), key=lambda m: m.name)
+        for member in members:
+            try:
+                makeOutputPath(OUTPUT_DIR, member.name)
+            except ValueError as ex:
+                print(f'iterArchive: skipping {ex}')
+                continue
+            yield member.name, tar.extractfile(member).read()
+
+def replayFile(name, source, outdir, pack=False):
+    """Run one saved feed through the live parse and format pipeline and write its bulletins, one per line, to outdir.  Returns (name, entries, packets, seconds)."""
+    import aprsnws, bulletin
+    
+    start = time.perf_counter()
+    formatter = bulletin.BulletinFormatter(appendId=aprsnws.MsgHandler().appendMsgId, pack=pack)
+    records = list(aprsnws.iterAlertRecords(source if isinstance(source, str) else io.BytesIO(source)))
+    rendered = formatter.renderSnapshot(records)
+    packets = [packet for record, p in rendered for packet in p]
+    
+    target = makeOutputPath(outdir, name)
+    os.makedirs(os.path.dirname(target) or '.', exist_ok=True)
+    with open(target, 'w') as f:
+        f.writelines(packet + '\n' for packet in packets)
+    return name, len(records), len(packets), time.perf_counter() - start
+
+def replayArchive(path, outdir=OUTPUT_DIR, pack=False, workers=None):
+    """Replay every file of an archive across a process pool.  Returns a list of (name, entries, packets, seconds) in name order and the wall-clock time."""
+    workers = workers or os.cpu_count() or 1
+    results, pending = [], set()
+    start = time.perf_counter()
+    
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for name, source in iterArchive(path):
+            if len(pending) >= workers * IN_FLIGHT:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                results.extend(future.result() for future in done)
+            pending.add(pool.submit(replayFile, name, source, outdir, pack))
+        results.extend(future.result() for future in wait(pending)[0])
+    return sorted(results), time.perf_counter() - start
+
+def compareGolden(outdir, golden):
+    """Diff every replayed output file against the golden set.  Returns a dict of output name -> unified diff lines for each file that is missing, extra or different."""
+    names = set()
+    for base in (outdir, golden):
+        for root, dirs, files in os.walk(base):
+            names.update(os.path.relpath(os.path.join(root, file), base) for file in files if file.endswith('.txt'))
+    
+    differences = {}
+    for name in sorted(names):
+        lines = []
+        for base in (golden, outdir):
+            try:
+                with open(os.path.join(base, name)) as f:
+                    lines.append([line.rstrip('\n') for line in f])
+            except FileNotFoundError:
+                lines.append(None)
+        if lines[0] != lines[1]:
+            differences[name] = list(difflib.unified_diff(lines[0] or [], lines[1] or [], f'golden/{name}', f'replay/{name}', lineterm=''))
+    return differences
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Replay archived CAP ATOM feeds through the APRS-NWS bulletin pipeline.')
+    parser.add_argument('archive', help='directory or tarball of saved ATOM XML files')
+    parser.add_argument('--out', default=OUTPUT_DIR, help='where to write per-file bulletins')
+    parser.add_argument('--golden', help='directory of golden outputs to diff against')
+    parser.add_argument('--pack', action='store_true', help='pack zones into UGC range bulletins')
+    parser.add_argument('--workers', type=int, help='worker processes (default: all cores)')
+    args = parser.parse_args()
+    
+    results, wall = replayArchive(args.archive, args.out, args.pack, args.workers)
+    entries = sum(r[1] for r in results)
+    packets = sum(r[2] for r in results)
+    for name, e, p, seconds in results:
+        print(f'{name}  {e} entries  {p} packets  {seconds * 1000:.1f}ms')
+    print(f'Replayed {len(results)} files, {entries} entries, {packets} packets in {wall:.2f}s '
+          f'({len(results) / wall if wall else 0:.1f} files/s, {packets / wall if wall else 0:.0f} pkt/s).')
+    
+    if args.golden:
+        differences = compareGolden(args.out, args.golden)
+        for name, diff in differences.items():
+            print(f'DIFF {name}')
+            for line in diff:
+                print(line)
+        print(f'{len(differences)} output files differ from {args.golden}.')
+        sys.exit(1 if differences else 0)
@@ -0,0 +1,186 @@
+#!/usr/bin/python3
+
+# APRS-NWS
+# Copyright 2021, Kurt Kochendarfer (KE7KUS)
+
+# ===GNU Public License v3===
+# This file is part of APRS-NWS.
+
+# APRS-NWS is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License 
+# as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+# APRS-NWS is distributed in the hope that it will be useful,but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License along with APRS-NWS.  If not, see <https://www.gnu.org/licenses/>.
+
+#-----IMPORTS-----#
+import heapq, time
+from collections import defaultdict
+
+#-----GLOBALS-----#
+BAUD = 1200
+PACKET_BYTES = 140      # Typical on-air size of one bulletin: ~83 bytes of text plus AX.25 header, digipeater path, flags and FCS.
+AIRTIME_FRACTION = 0.1  # Share of channel airtime the bulletins may use.
+BURST = 3               # Packets the token bucket may release back to back after an idle spell.  Kept small so a backlog is paced, not dumped.
+MIN_PRIORITY = 2000     # Packets below this priority (roughly Moderate and less) may be dropped once they have waited MAX_DEFER seconds.
+MAX_DEFER = 3600
+MAX_PENDING = 500
+OUTSIDE_PENALTY = 5000  # Priority subtracted from alerts whose polygon misses our coverage area (geofence 'deprioritize' mode).
+
+SEVERITY_RANK = {'Extreme':4, 'Severe':3, 'Moderate':2, 'Minor':1, 'Unknown':0}
+URGENCY_RANK = {'Immediate':4, 'Expected':3, 'Future':2, 'Past':1, 'Unknown':0}
+CERTAINTY_RANK = {'Observed':4, 'Likely':3, 'Possible':2, 'Unlikely':1, 'Unknown':0}
+EVENT_CLASS_RANK = (('Emergency', 4), ('Immediate', 4), ('Warning', 3), ('Watch', 2), ('Advisory', 1))
+
+def makePacketsPerMinute(fraction=AIRTIME_FRACTION, baud=BAUD, packet_bytes=PACKET_BYTES):
+    """Return the number of bulletins per minute that fit in the given fraction of channel airtime."""
+    seconds_per_packet = packet_bytes * 8 / baud
+    return 60 * fraction / seconds_per_packet
+
+def makeEventClass(event):
+    """Rank an NWS event name by its class: emergencies and warnings above watches, watches above advisories, advisories above statements."""
+    for suffix, rank in EVENT_CLASS_RANK:
+        if event.endswith(suffix):
+            return rank
+    return 0
+
+def makePriority(record):
+    """Return the transmit priority of an AlertRecord.  Severity dominates, then event class, urgency and certainty.  Higher is more urgent."""
+    return (SEVERITY_RANK.get(record.severity, 0) * 1000 + makeEventClass(record.event) * 100
+            + URGENCY_RANK.get(record.urgency, 0) * 10 + CERTAINTY_RANK.get(record.certainty, 0))
+
+#-----CLASSES-----#
+class TransmitScheduler:
+    """Priority-ordered, airtime-budgeted packet scheduler placed between the bulletin formatter and the spool.  A token bucket limits the packets released per minute.  Pending packets are released highest priority first, and within one priority level round-robin by zone so one large alert cannot starve other zones.  Time comes from an injectable clock so the scheduler is deterministic under simulation."""
+    
+    def __init__(self, rate=None, burst=None, clock=time.monotonic, min_priority=MIN_PRIORITY, max_defer=MAX_DEFER, max_pending=MAX_PENDING):
+        """Initializes the scheduler with a rate in packets per minute (default from the airtime budget) and a bucket size in packets (default BURST)."""
+        self.rate = rate if rate is not None else makePacketsPerMinute()
+        self.burst = burst if burst is not None else BURST
+        self.clock = clock
+        self.min_priority = min_priority
+        self.max_defer = max_defer
+        self.max_pending = max_pending
+        
+        self.tokens = self.burst
+        self.last = self.clock()
+        self.pending = []
+        self.zone_turns = defaultdict(int)
+        self.seq = 0
+        self.released = 0
+        self.dropped = 0
+    
+    def submit(self, record, packets, penalty=0):
+        """Queue the packets of one AlertRecord, less an optional priority penalty.  Each packet's to-call zone takes its next round-robin turn within the alert's priority level."""
+        priority = makePriority(record) - penalty
+        now = self.clock()
+        
+        for packet in packets:
+            zone = packet[1:7]
+            turn = self.zone_turns[(priority, zone)]
+            self.zone_turns[(priority, zone)] = turn + 1
+            heapq.heappush(self.pending, (-priority, turn, self.seq, now, packet))
+            self.seq += 1
+        
+        while len(self.pending) > self.max_pending:
+            self.dropLowest()
+    
+    def discard(self, packets):
+        """Remove pending copies of the given packets (superseded or expired bulletins).  Returns the number removed."""
+        packets = set(packets)
+        kept = [entry for entry in self.pending if entry[-1] not in packets]
+        removed = len(self.pending) - len(kept)
+        if removed:
+            self.pending = kept
+            heapq.heapify(self.pending)
+        return removed
+    
+    def dropLowest(self):
+        """Drop the lowest-priority pending packet."""
+        lowest = max(self.pending)
+        self.pending.remove(lowest)
+        heapq.heapify(self.pending)
+        self.dropped += 1
+    
+    def refill(self, now):
+        """Add tokens for the time elapsed since the last refill."""
+        self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate / 60)
+        self.last = now
+    
+    def release(self):
+        """Return the packets the airtime budget allows right now, highest priority first.  Low-priority packets that have been deferred longer than max_defer are dropped instead of sent."""
+        now = self.clock()
+        self.refill(now)
+        out = []
+        
+        while self.pending and self.tokens >= 1:
+            priority, turn, seq, queued, packet = heapq.heappop(self.pending)
+            if -priority < self.min_priority and now - queued > self.max_defer:
+                self.dropped += 1
+                continue
+            out.append(packet)
+            self.tokens -= 1
+        
+        if not self.pending:
+            self.zone_turns.clear()
+        self.released += len(out)
+        return out
+    
+    def queued(self, packets):
+        """Return the set of the given packets that are still pending."""
+        packets = set(packets)
+        return {entry[-1] for entry in self.pending if entry[-1] in packets}
+    
+    def nextRelease(self):
+        """Return the seconds until the bucket holds a whole token again (0 if it does now)."""
+        self.refill(self.clock())
+        return max(1 - self.tokens, 0) * 60 / self.rate
+    
+    def drain(self):
+        """Remove and return every pending packet in priority order, ignoring the airtime budget.  Used at shutdown to hand held packets to the spool."""
+        out = [heapq.heappop(self.pending)[-1] for n in range(len(self.pending))]
+        self.zone_turns.clear()
+        return out
+    
+    def depth(self):
+        """Return the number of packets waiting for airtime."""
+        return len(self.pending)
+
+class SimClock:
+    """Manually advanced clock for deterministic scheduler simulations."""
+    
+    def __init__(self, start=0.0):
+        self.now = start
+    
+    def __call__(self):
+        return self.now
+
+def simulate(arrivals, rate=None, burst=None, step=1.0, duration=None):
+    """Replay a recorded outbreak through a TransmitScheduler.  arrivals is a list of (seconds, AlertRecord, packets) in time order.  Returns (transmissions, first) where transmissions lists (seconds, packet) in send order and first maps each alert ID to its time-to-first-transmission in seconds."""
+    clock = SimClock()
+    s = TransmitScheduler(rate=rate, burst=burst, clock=clock)
+    arrivals = sorted(arrivals, key=lambda a: a[0])
+    owner, arrived, first, transmissions = {}, {}, {}, []
+    end = duration if duration is not None else (arrivals[-1][0] if arrivals else 0)
+    n = 0
+    
+    while clock.now <= end or s.depth():
+        while n < len(arrivals) and arrivals[n][0] <= clock.now:
+            t, record, packets = arrivals[n]
+            arrived.setdefault(record.id, t)
+            for packet in packets:
+                owner[packet] = record.id
+            s.submit(record, packets)
+            n += 1
+        
+        for packet in s.release():
+            transmissions.append((clock.now, packet))
+            alert = owner.get(packet)
+            if alert is not None and alert not in first:
+                first[alert] = clock.now - arrived[alert]
+        
+        if duration is not None and clock.now > duration:
+            break
+        clock.now += step
+    return transmissions, first
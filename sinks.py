@@ -0,0 +1,284 @@
+#!/usr/bin/python3
+
+# APRS-NWS
+# Copyright 2021, Kurt Kochendarfer (KE7KUS)
+
+# ===GNU Public License v3===
+# This file is part of APRS-NWS.
+
+# APRS-NWS is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License 
+# as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+# APRS-NWS is distributed in the hope that it will be useful,but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License along with APRS-NWS.  If not, see <https://www.gnu.org/licenses/>.
+
+#-----IMPORTS-----#
+import sys, time, socket, select, threading
+from collections import deque
+
+#-----GLOBALS-----#
+SOFTWARE = 'aprsnws'
+VERSION = '2.0'
+TOCALL = 'APRS'             # AX.25 destination / TNC2 to-call for generated packets.
+KEEPALIVE = 120             # Seconds of idle before a keepalive comment is sent on APRS-IS.
+MIN_BACKOFF = 1
+MAX_BACKOFF = 300
+HOUSEKEEPING = 15           # Seconds between background keepalive/drain/reconnect checks, independent of the poll interval.
+MAX_BUFFER = 1000           # Packets held while a sink is disconnected; the oldest are discarded beyond this.
+
+FEND, FESC, TFEND, TFESC = 0xC0, 0xDB, 0xDC, 0xDD
+
+def makeAX25Address(call, last=False):
+    """Encode a callsign(-SSID) as a 7-byte AX.25 address field."""
+    base, _, ssid = call.upper().partition('-')
+    field = bytes((ord(c) << 1) for c in base[:6].ljust(6))
+    flags = 0x60 | ((int(ssid or 0) & 0x0F) << 1) | (0x01 if last else 0x00)
+    return field + bytes([flags])
+
+def makeAX25Frame(source, dest, path, info):
+    """Build an AX.25 UI frame (without FCS, which the TNC adds) carrying info."""
+    calls = [dest, source] + list(path)
+    header = b''.join(makeAX25Address(c, n == len(calls) - 1) for n, c in enumerate(calls))
+    return header + b'\x03\xf0' + info.encode('ascii', 'replace')
+
+def makeKISSFrame(frame, port=0):
+    """Wrap an AX.25 frame in a KISS data frame, escaping FEND/FESC bytes."""
+    body = bytearray([(port & 0x0F) << 4])
+    for b in frame:
+        if b == FEND:
+            body += bytes([FESC, TFEND])
+        elif b == FESC:
+            body += bytes([FESC, TFESC])
+        else:
+            body.append(b)
+    return bytes([FEND]) + bytes(body) + bytes([FEND])
+
+#-----CLASSES-----#
+class Sink:
+    """Destination for formatted bulletin packets.  Subclasses implement send()."""
+    
+    def send(self, packets):
+        """Deliver a list of packets."""
+        raise NotImplementedError
+    
+    def queued(self, packets):
+        """Return the set of the given packets this sink is still holding, not yet sent on."""
+        return set()
+    
+    def purge(self, packets):
+        """Remove held copies of the given packets (superseded or expired bulletins).  Returns the number removed."""
+        return 0
+    
+    def poll(self):
+        """Periodic housekeeping between cycles (keepalives, reconnects)."""
+    
+    def start(self, interval=HOUSEKEEPING):
+        """Begin running poll() on a background timer, so housekeeping does not wait for the next poll cycle."""
+    
+    def close(self):
+        """Release any resources held by the sink."""
+
+class SpoolSink(Sink):
+    """The aprx path: packets are appended to the AlertSpool and beaconed one at a time by aprxfeeder.py."""
+    
+    def __init__(self, queue):
+        self.queue = queue
+    
+    def send(self, packets):
+        self.queue.push(packets)
+    
+    def queued(self, packets):
+        return self.queue.queued(packets)
+    
+    def purge(self, packets):
+        return self.queue.purge(packets)
+
+class StdoutSink(Sink):
+    """Writes each packet to a stream (stdout by default), one per line."""
+    
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+    
+    def send(self, packets):
+        for packet in packets:
+            self.stream.write(packet + '\n')
+        self.stream.flush()
+
+class TCPSink(Sink):
+    """Base class for sinks holding one long-lived TCP connection.  Packets are buffered while disconnected and reconnects back off exponentially, so a dead server never blocks the poll cycle."""
+    
+    def __init__(self, host, port, timeout=10, clock=time.monotonic):
+        """Initializes the sink; the connection is opened on first use."""
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.clock = clock
+        self.sock = None
+        self.pending = deque(maxlen=MAX_BUFFER)
+        self.backoff = MIN_BACKOFF
+        self.retry_at = 0
+        self.last_write = 0
+        self.sent = 0
+        self.reconnects = 0
+        self.lock = threading.RLock()       # Serializes the poll cycle and the housekeeping thread.
+        self.stopped = threading.Event()
+    
+    def login(self):
+        """Hook run after each (re)connect."""
+    
+    def encode(self, packet):
+        """Convert a bulletin packet to the bytes written on the wire."""
+        raise NotImplementedError
+    
+    def connect(self):
+        """Open the connection unless a backoff delay is still running.  Returns True if connected."""
+        if self.sock is not None:
+            return True
+        if self.clock() < self.retry_at:
+            return False
+        
+        try:
+            self.sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            self.login()
+            self.backoff = MIN_BACKOFF
+            self.reconnects += 1
+            return True
+        
+        except Exception as ex:
+            print(f'{type(self).__name__} connect Exception: {ex}')
+            self.disconnect()
+            return False
+    
+    def disconnect(self):
+        """Drop the connection and schedule the next reconnect attempt."""
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+        self.sock = None
+        self.retry_at = self.clock() + self.backoff
+        self.backoff = min(self.backoff * 2, MAX_BACKOFF)
+    
+    def write(self, data):
+        """Write raw bytes to the connection."""
+        self.sock.sendall(data)
+        self.last_write = self.clock()
+    
+    def drain(self):
+        """Discard anything the server sent us; detect a connection closed by the far end."""
+        try:
+            while self.sock is not None and select.select([self.sock], [], [], 0)[0]:
+                if not self.sock.recv(4096):
+                    print(f'{type(self).__name__}: connection closed by server')
+                    self.disconnect()
+        
+        except OSError as ex:
+            print(f'{type(self).__name__} drain Exception: {ex}')
+            self.disconnect()
+    
+    def flush(self):
+        """Send buffered packets in order; a packet is only removed from the buffer once written."""
+        if not self.pending or not self.connect():
+            return
+        
+        self.drain()
+        try:
+            while self.pending and self.sock is not None:
+                self.write(self.encode(self.pending[0]))
+                self.pending.popleft()
+                self.sent += 1
+        
+        except OSError as ex:
+            print(f'{type(self).__name__} send Exception: {ex}')
+            self.disconnect()
+    
+    def send(self, packets):
+        with self.lock:
+            self.pending.extend(packets)
+            self.flush()
+    
+    def queued(self, packets):
+        with self.lock:
+            return set(packets).intersection(self.pending)
+    
+    def purge(self, packets):
+        packets = set(packets)
+        with self.lock:
+            kept = [p for p in self.pending if p not in packets]
+            removed = len(self.pending) - len(kept)
+            if removed:
+                self.pending.clear()
+                self.pending.extend(kept)
+            return removed
+    
+    def poll(self):
+        with self.lock:
+            self.flush()
+            if self.sock is not None:
+                self.drain()
+    
+    def start(self, interval=HOUSEKEEPING):
+        def housekeeping():
+            while not self.stopped.wait(interval):
+                try:
+                    self.poll()
+                except Exception as ex:
+                    print(f'{type(self).__name__} housekeeping Exception: {ex}')
+        
+        threading.Thread(target=housekeeping, name=f'{type(self).__name__}-housekeeping', daemon=True).start()
+    
+    def close(self):
+        self.stopped.set()
+        with self.lock:
+            self.flush()
+            if self.sock is not None:
+                self.sock.close()
+                self.sock = None
+
+class APRSISSink(TCPSink):
+    """APRS-IS client.  Logs in with callsign/passcode and an optional server-side filter, sends bulletins as TNC2 text lines and keeps the connection alive with comment lines."""
+    
+    def __init__(self, host, callsign, passcode, port=14580, filter=None, keepalive=KEEPALIVE, **kwargs):
+        super().__init__(host, port, **kwargs)
+        self.callsign = callsign.upper()
+        self.passcode = passcode
+        self.filter = filter
+        self.keepalive = keepalive
+    
+    def login(self):
+        line = f'user {self.callsign} pass {self.passcode} vers {SOFTWARE} {VERSION}'
+        if self.filter:
+            line += f' filter {self.filter}'
+        self.write((line + '\r\n').encode('ascii'))
+    
+    def encode(self, packet):
+        return f'{self.callsign}>{TOCALL},TCPIP*:{packet}\r\n'.encode('ascii', 'replace')
+    
+    def poll(self):
+        """Flush buffered packets, read anything the server sent, then send a keepalive if the link has been idle."""
+        with self.lock:
+            self.flush()
+            if self.connect():
+                self.drain()
+                if self.sock is not None and self.clock() - self.last_write >= self.keepalive:
+                    try:
+                        self.write(f'# {SOFTWARE} keepalive\r\n'.encode('ascii'))
+                    except OSError as ex:
+                        print(f'APRSISSink keepalive Exception: {ex}')
+                        self.disconnect()
+
+class KISSSink(TCPSink):
+    """KISS-over-TCP client for Direwolf and other software/hardware TNCs.  Each bulletin is sent as an AX.25 UI frame from callsign via path."""
+    
+    def __init__(self, host, callsign, port=8001, path=('WIDE2-1',), kiss_port=0, **kwargs):
+        super().__init__(host, port, **kwargs)
+        self.callsign = callsign.upper()
+        self.path = tuple(path)
+        self.kiss_port = kiss_port
+    
+    def encode(self, packet):
+        return makeKISSFrame(makeAX25Frame(self.callsign, TOCALL, self.path, packet), self.kiss_port)
@@ -0,0 +1,98 @@
+#!/usr/bin/python3
+
+# APRS-NWS
+# Copyright 2021, Kurt Kochendarfer (KE7KUS)
+
+# ===GNU Public License v3===
+# This file is part of APRS-NWS.
+
+# APRS-NWS is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License 
+# as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+# APRS-NWS is distributed in the hope that it will be useful,but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License along with APRS-NWS.  If not, see <https://www.gnu.org/licenses/>.
+
+#-----IMPORTS-----#
+import sqlite3, time
+
+#-----GLOBALS-----#
+SPOOL_PATH = '/tmp/wxalerts.db'
+LOCK_TIMEOUT = 10       # Seconds to wait for the other process (producer/consumer) to release the spool lock.
+
+#-----CLASSES-----#
+class AlertSpool:
+    """SQLite-backed FIFO packet queue shared between the aprsnws.py producer and the aprxfeeder.py consumer.  SQLite's file locking serializes the two processes; every push/pop is a single transaction, so packets survive restarts and a pop never hands the same packet out twice."""
+    
+    def __init__(self, path=SPOOL_PATH):
+        """Opens (creating if needed) the spool database at path."""
+        self.path = path
+        self.db = sqlite3.connect(self.path, timeout=LOCK_TIMEOUT, isolation_level=None)
+        self.db.execute('PRAGMA auto_vacuum=INCREMENTAL')       # Must precede WAL mode; spools created before it was set need one VACUUM.
+        if self.db.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+            self.db.execute('VACUUM')
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('CREATE TABLE IF NOT EXISTS packets (seq INTEGER PRIMARY KEY AUTOINCREMENT, packet TEXT NOT NULL, queued REAL NOT NULL)')
+        self.db.execute('CREATE INDEX IF NOT EXISTS packets_by_text ON packets (packet)')    # For purge() and queued().
+    
+    def push(self, packets):
+        """Append one or more packets to the tail of the queue in a single transaction."""
+        if isinstance(packets, str):
+            packets = [packets]
+        
+        now = time.time()
+        with self.db:
+            self.db.execute('BEGIN IMMEDIATE')
+            self.db.executemany('INSERT INTO packets (packet, queued) VALUES (?, ?)', [(p, now) for p in packets])
+    
+    def purge(self, packets):
+        """Remove every queued copy of the given packets (superseded or expired bulletins) in a single transaction.  Returns the number of packets removed."""
+        packets = set(packets)
+        if not packets:
+            return 0
+        
+        with self.db:
+            self.db.execute('BEGIN IMMEDIATE')
+            removed = self.db.executemany('DELETE FROM packets WHERE packet = ?', [(p,) for p in packets]).rowcount
+        return removed
+    
+    def queued(self, packets):
+        """Return the set of the given packets that are still waiting in the queue."""
+        packets = list(set(packets))
+        found = set()
+        for n in range(0, len(packets), 500):
+            chunk = packets[n:n + 500]
+            found.update(row[0] for row in self.db.execute(f'SELECT packet FROM packets WHERE packet IN ({",".join("?" * len(chunk))})', chunk))
+        return found
+    
+    def pop(self):
+        """Atomically remove and return the packet at the head of the queue, or None if the queue is empty.  An emptied queue is compacted."""
+        with self.db:
+            self.db.execute('BEGIN IMMEDIATE')
+            row = self.db.execute('SELECT seq, packet FROM packets ORDER BY seq LIMIT 1').fetchone()
+            if row is None:
+                return None
+            self.db.execute('DELETE FROM packets WHERE seq = ?', (row[0],))
+        
+        if not self.db.execute('SELECT EXISTS(SELECT 1 FROM packets)').fetchone()[0]:
+            self.compact()
+        return row[1]
+    
+    def depth(self):
+        """Return the number of packets waiting in the queue."""
+        return self.db.execute('SELECT COUNT(*) FROM packets').fetchone()[0]
+    
+    def age(self, now=None):
+        """Return the age in seconds of the oldest queued packet, or 0 if the queue is empty."""
+        oldest = self.db.execute('SELECT MIN(queued) FROM packets').fetchone()[0]
+        return (now or time.time()) - oldest if oldest is not None else 0
+    
+    def compact(self):
+        """Return pages freed by popped packets to the filesystem and checkpoint the write-ahead log."""
+        self.db.executescript('PRAGMA incremental_vacuum;')     # execute() would only step it once, freeing a single page.
+        self.db.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    
+    def close(self):
+        """Close the spool database."""
+        self.db.close()
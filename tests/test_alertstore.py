@@ -0,0 +1,86 @@
+import io
+
+import aprsnws, alertstore, sinks, spool
+
+def makeRecord(id, msgType='Alert', expires='2099-01-01T00:00:00-07:00', references=()):
+    return aprsnws.AlertRecord(id, '', '2021-01-14T18:00:00-07:00', 'Winter Storm Warning', 'Actual', msgType, 'Moderate',
+                               'Likely', 'Expected', 'Met', '', expires, '', 'Test Area', ('NMZ201',), references)
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+def test_rebeacon_tracks_waiting_per_sink(tmp_path):
+    queue = spool.AlertSpool(str(tmp_path / 'spool.db'))
+    stream = io.StringIO()
+    outputs = [sinks.SpoolSink(queue), sinks.StdoutSink(stream)]
+    clock = Clock()
+    store = alertstore.AlertStore(rebeacon=60, clock=clock)
+    packets = ['packet one', 'packet two']
+
+    store.track(makeRecord('A'), packets)
+    aprsnws.deliver(outputs, packets)
+    queue.pop()
+    clock.now += 60
+    assert aprsnws.maintainStore(store, outputs) == (0, 1)
+
+    # The spool still held 'packet two', so only 'packet one' goes back on its tail; the direct sink gets both again.
+    assert [queue.pop(), queue.pop(), queue.pop()] == ['packet two', 'packet one', None]
+    assert stream.getvalue().splitlines() == packets * 2
+    queue.close()
+
+def test_rebeacon_without_spool():
+    stream = io.StringIO()
+    clock = Clock()
+    store = alertstore.AlertStore(rebeacon=60, clock=clock)
+
+    store.track(makeRecord('A'), ['packet one'])
+    clock.now += 60
+    assert aprsnws.maintainStore(store, [sinks.StdoutSink(stream)]) == (0, 1)
+    assert stream.getvalue() == 'packet one\n'
+
+def test_cancel_packets_survive_expiry_and_disappearance(tmp_path):
+    queue = spool.AlertSpool(str(tmp_path / 'spool.db'))
+    outputs = [sinks.SpoolSink(queue)]
+    clock = Clock(4102444800.0)     # 2100-01-01, after every expiry below.
+    store = alertstore.AlertStore(rebeacon=0, clock=clock)
+
+    def send(record, packets):
+        purged = aprsnws.purgePackets(store.track(record, packets, now=1000.0), outputs)
+        aprsnws.deliver(outputs, packets)
+        return purged
+
+    assert send(makeRecord('A'), ['alert']) == 0
+    assert send(makeRecord('U', 'Update', references=('A',)), ['update']) == 1
+    assert send(makeRecord('C', 'Cancel', expires='2021-01-15T00:00:00-07:00', references=('U',)), ['cancel']) == 1
+
+    # The Cancel expires off the heap, then drops out of the feed: its packet stays queued.
+    assert store.expire() == (['C'], [])
+    assert aprsnws.purgePackets(store.retire('C'), outputs) == 0
+    assert 'C' not in store and queue.queued(['cancel']) == {'cancel'}
+    assert aprsnws.maintainStore(store, outputs) == (0, 0)
+    assert 'C' in store.cancels
+
+    # Only a newer message superseding it purges it.
+    assert send(makeRecord('C2', 'Alert', references=('C',)), ['reissue']) == 1
+    assert [queue.pop(), queue.pop()] == ['reissue', None]
+    queue.close()
+
+def test_sent_cancels_are_pruned(tmp_path):
+    queue = spool.AlertSpool(str(tmp_path / 'spool.db'))
+    outputs = [sinks.SpoolSink(queue)]
+    store = alertstore.AlertStore(rebeacon=0)
+
+    store.track(makeRecord('C', 'Cancel'), ['cancel'])
+    aprsnws.deliver(outputs, ['cancel'])
+    assert store.retire('C') == ()
+    aprsnws.maintainStore(store, outputs)
+    assert store.cancels == {'C': ('cancel',)}
+
+    assert queue.pop() == 'cancel'
+    aprsnws.maintainStore(store, outputs)
+    assert store.cancels == {}
+    queue.close()
@@ -0,0 +1,15 @@
+import bench
+
+API = 'https://api.weather.gov/alerts/urn:oid:2.49.0.1.840.0.'
+
+def test_fixture_pages_give_expected_records():
+    records, packets, requests = bench.replayFixtures()
+
+    assert requests == 3
+    assert len(packets) == 5
+    assert [(r.id, r.event, r.msgType, r.geocodes, r.references) for r in records] == [
+        (API + 'a1b2c3d4.001.1', 'Winter Storm Warning', 'Alert', ('NMZ201', 'NMZ202', 'NMZ203'), ()),
+        (API + 'e5f6a7b8.002.1', 'Tornado Warning', 'Alert', ('NMC001',), ()),
+        (API + 'c9d0e1f2.003.2', 'Frost Advisory', 'Update', ('NMZ241',), (API + 'c9d0e1f2.003.1',)),
+    ]
+    assert records[1].polygon and not records[0].polygon
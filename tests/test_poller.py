@@ -0,0 +1,93 @@
+import contextlib, io
+
+import pytest
+
+import aprsnws, alertstate, alertstore, bench, feedcache, spool
+
+@pytest.fixture
+def feeds(tmp_path):
+    server = bench.FeedServer(str(tmp_path))
+    yield tmp_path, server
+    server.close()
+
+def runMain(tmp_path, poller):
+    state = alertstate.AlertState(str(tmp_path / 'state.json'))
+    queue = spool.AlertSpool(str(tmp_path / 'spool.db'))
+    with contextlib.redirect_stdout(io.StringIO()):
+        snapshot = aprsnws.main(poller, state, queue, store=alertstore.AlertStore())
+    queue.close()
+    return snapshot
+
+def test_one_fetch_per_cycle(feeds):
+    root, server = feeds
+    (root / 'nm.xml').write_bytes(bench.makeFeed(25))
+    poller = aprsnws.AlertPoller(('nm',), url=server.url)
+
+    for cycle in range(3):
+        before = aprsnws.FETCH_COUNT
+        snapshot = runMain(root, poller)
+        assert aprsnws.FETCH_COUNT - before == 1
+        assert len(snapshot) == 25
+    assert server.requests == 3
+    poller.close()
+
+def test_merge_keeps_newest_update(feeds):
+    root, server = feeds
+    (root / 'nm.xml').write_bytes(bench.makeFeed(5, seed=1))
+    newer = bench.makeFeed(5, seed=2).replace(b'<updated>2021-01-14T18:00:00', b'<updated>2021-01-14T19:00:00')
+    (root / 'az.xml').write_bytes(newer)
+    poller = aprsnws.AlertPoller(('nm', 'az'), url=server.url, workers=2)
+    snapshot = poller.poll()
+    poller.close()
+
+    assert server.requests == 2
+    assert not poller.errors
+    assert len(snapshot) == 5
+    assert {record.updated for record in snapshot} == {'2021-01-14T19:00:00-07:00'}
+
+def test_failing_locale_is_isolated(feeds):
+    root, server = feeds
+    (root / 'nm.xml').write_bytes(bench.makeFeed(4, seed=1))
+    (root / 'tx.xml').write_bytes(bench.makeFeed(3, seed=3).replace(b'BENCH', b'OTHER'))
+    poller = aprsnws.AlertPoller(('nm', 'missing', 'tx'), url=server.url, workers=3)
+    snapshot = poller.poll()
+    poller.close()
+
+    assert list(poller.errors) == ['missing']
+    assert len(snapshot) == 7
+
+def test_stream_uses_conditional_get(feeds, tmp_path):
+    root, server = feeds
+    (root / 'us.xml').write_bytes(bench.makeFeed(6))
+    cache = feedcache.FeedCache(str(tmp_path / 'cache.json'))
+    adapter = aprsnws.AtomAdapter(server.url, stream=True)
+    poller = aprsnws.AlertPoller(('us',), cache=cache, adapter=adapter)
+
+    first = poller.poll()
+    assert poller.changed and len(first) == 6
+    second = poller.poll()
+    assert not poller.changed
+    assert second == first
+    assert server.requests == 2
+    poller.close()
+
+def test_cancel_survives_leaving_the_feed(feeds):
+    root, server = feeds
+    alert = bench.makeFeed(1)
+    cancel = alert.replace(b'<cap:msgType>Alert', b'<cap:msgType>Cancel').replace(b'<updated>2021-01-14T18:00:00', b'<updated>2021-01-14T19:00:00')
+    state = alertstate.AlertState(str(root / 'state.json'))
+    queue = spool.AlertSpool(str(root / 'spool.db'))
+    store = alertstore.AlertStore()
+    poller = aprsnws.AlertPoller(('nm',), url=server.url)
+
+    for feed in (alert, cancel, bench.makeFeed(0)):
+        (root / 'nm.xml').write_bytes(feed)
+        with contextlib.redirect_stdout(io.StringIO()):
+            aprsnws.main(poller, state, queue, store=store)
+        if feed is alert:
+            alerted = queue.depth()
+    poller.close()
+
+    assert alerted and queue.depth() == alerted      # The Alert packets were replaced by the Cancel's, which are still queued.
+    assert all('CANX' in queue.pop() for n in range(alerted))
+    queue.close()
@@ -0,0 +1,35 @@
+import io, os, tarfile
+
+import pytest
+
+import bench, replay
+
+def addMember(tar, name, data):
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    tar.addfile(info, io.BytesIO(data))
+
+def test_output_path_stays_in_outdir(tmp_path):
+    outdir = str(tmp_path / 'out')
+    assert replay.makeOutputPath(outdir, 'a/b/nm.xml') == os.path.join(outdir, 'a', 'b', 'nm.txt')
+    assert replay.makeOutputPath(outdir, 'a/../nm.xml') == os.path.join(outdir, 'nm.txt')
+    for name in ('../x.xml', 'a/../../x.xml', '/tmp/x.xml'):
+        with pytest.raises(ValueError):
+            replay.makeOutputPath(outdir, name)
+
+def test_tarball_cannot_write_outside_out(tmp_path):
+    archive = tmp_path / 'feeds.tar.gz'
+    feed = bench.makeFeed(2)
+    with tarfile.open(archive, 'w:gz') as tar:
+        addMember(tar, 'nm.xml', feed)
+        addMember(tar, '../x.xml', feed)
+
+    outdir = tmp_path / 'out'
+    results, wall = replay.replayArchive(str(archive), str(outdir), workers=1)
+    assert [r[0] for r in results] == ['nm.xml']
+    assert (outdir / 'nm.txt').exists()
+    assert not (tmp_path / 'x.txt').exists()
+
+    with pytest.raises(ValueError):
+        replay.replayFile('../x.xml', feed, str(outdir))
+    assert not (tmp_path / 'x.txt').exists()
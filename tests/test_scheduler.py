@@ -0,0 +1,18 @@
+import aprsnws, scheduler
+
+def test_backlog_is_paced_after_idle():
+    clock = scheduler.SimClock()
+    txsched = scheduler.TransmitScheduler(clock=clock)
+    record = aprsnws.AlertRecord('T', '', '', 'Tornado Warning', 'Actual', 'Alert', 'Extreme', 'Observed', 'Immediate',
+                                 'Met', '', '', '', '', ('NMC001',))
+
+    clock.now += 1800       # A long backed-off poll interval with nothing to send.
+    txsched.submit(record, [f':NMC{n:03d}   :TORNADO WARNING' for n in range(300)])
+    assert len(txsched.release()) == scheduler.BURST
+
+    released = 0
+    for second in range(60):
+        clock.now += 1
+        released += len(txsched.release())
+    assert released <= int(txsched.rate) + 1
+    assert txsched.depth() == 300 - scheduler.BURST - released
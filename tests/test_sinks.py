@@ -0,0 +1,98 @@
+import time
+
+import pytest
+
+import bench, sinks
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+def waitFor(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.01)
+
+@pytest.fixture
+def aprsis():
+    server = bench.TNCServer(greeting=b'# javAPRSSrvr 4.3.0b22\r\n')
+    yield server
+    server.close()
+
+@pytest.fixture
+def tnc():
+    server = bench.TNCServer(kiss=True)
+    yield server
+    server.close()
+
+def test_aprsis_login_line(aprsis):
+    sink = sinks.APRSISSink(aprsis.host, 'n0call-1', '12345', port=aprsis.port, filter='r/35.08/-106.65/150')
+    sink.send(['::NMZ201   :WINTER STORM WARNING'])
+    waitFor(lambda: len(aprsis.frames) == 2)
+    sink.close()
+
+    assert aprsis.frames == [f'user N0CALL-1 pass 12345 vers {sinks.SOFTWARE} {sinks.VERSION} filter r/35.08/-106.65/150',
+                             'N0CALL-1>APRS,TCPIP*:::NMZ201   :WINTER STORM WARNING']
+
+def test_aprsis_keepalive(aprsis):
+    clock = Clock()
+    sink = sinks.APRSISSink(aprsis.host, 'N0CALL', '-1', port=aprsis.port, keepalive=120, clock=clock)
+    sink.poll()
+    waitFor(lambda: len(aprsis.frames) == 1)
+
+    clock.now += 119
+    sink.poll()
+    clock.now += 1
+    sink.poll()
+    waitFor(lambda: len(aprsis.frames) == 2)
+    sink.close()
+    assert aprsis.frames[1] == f'# {sinks.SOFTWARE} keepalive'
+
+def test_reconnect_buffers_packets(aprsis):
+    clock = Clock()
+    sink = sinks.APRSISSink(aprsis.host, 'N0CALL', '-1', port=aprsis.port, clock=clock)
+    sink.send(['first'])
+    waitFor(lambda: len(aprsis.frames) == 2)
+
+    aprsis.drop()
+    waitFor(lambda: not aprsis.clients)
+    sink.send(['second', 'third'])
+    assert sink.sock is None
+    assert list(sink.pending) == ['second', 'third']
+
+    sink.poll()     # Still backing off.
+    assert aprsis.connections == 1
+    clock.now += sinks.MIN_BACKOFF
+    sink.poll()
+    waitFor(lambda: len(aprsis.frames) == 5)
+    sink.close()
+
+    assert aprsis.connections == 2
+    assert aprsis.frames[2:] == [aprsis.frames[0], 'N0CALL>APRS,TCPIP*:second', 'N0CALL>APRS,TCPIP*:third']
+    assert not sink.pending
+
+def test_kiss_frame(tnc):
+    packet = '::NMZ201   :WINTER STORM WARNING'
+    sink = sinks.KISSSink(tnc.host, 'N0CALL-1', port=tnc.port, path=('WIDE2-1',))
+    sink.send([packet])
+    waitFor(lambda: tnc.frames)
+    sink.close()
+
+    frame = tnc.frames[0]
+    assert frame == sinks.makeAX25Frame('N0CALL-1', sinks.TOCALL, ('WIDE2-1',), packet)
+    assert frame[:7] == bytes(ord(c) << 1 for c in 'APRS  ') + b'\x60'
+    assert frame[7:14] == bytes(ord(c) << 1 for c in 'N0CALL') + b'\x62'
+    assert frame[14:21] == bytes(ord(c) << 1 for c in 'WIDE2 ') + b'\x63'
+    assert frame[21:23] == b'\x03\xf0'
+    assert frame[23:] == packet.encode('ascii')
+
+def test_decode_kiss_unescapes():
+    frame = bytes([0x82, 0xc0, 0x01, 0xdb, 0x02])
+    data = sinks.makeKISSFrame(frame) + sinks.makeKISSFrame(b'second') + b'\xc0\x00part'
+
+    assert data.count(b'\xc0') == 5
+    assert bench.decodeKISS(data) == ([frame, b'second'], b'\x00part')
@@ -0,0 +1,218 @@
+#!/usr/bin/python3
+
+# APRS-NWS
+# Copyright 2021, Kurt Kochendarfer (KE7KUS)
+
+# ===GNU Public License v3===
+# This file is part of APRS-NWS.
+
+# APRS-NWS is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License 
+# as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+# APRS-NWS is distributed in the hope that it will be useful,but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License along with APRS-NWS.  If not, see <https://www.gnu.org/licenses/>.
+
+#-----IMPORTS-----#
+import os, sys, csv, mmap, struct
+import nm
+
+#-----GLOBALS-----#
+INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'zones.idx')
+MAGIC = b'APRSZT1\n'
+TEXT_LEN = 15           # Bytes of ZONETEXT per UGC code (see README bulletin format).
+SLOTS = 2000            # Direct-address slots per state: 000-999 for zones (Z), 1000-1999 for counties (C).
+TABLE_LEN = SLOTS * TEXT_LEN
+DIRENTRY = struct.Struct('<2sI')
+
+# Word abbreviations applied when deriving 15-character zone text from full NWS zone/county names.
+ABBREVIATIONS = {'COUNTY':'CTY','COUNTIES':'CTYS','MOUNTAINS':'MTNS','MOUNTAIN':'MTN','NORTHERN':'N','SOUTHERN':'S','EASTERN':'E','WESTERN':'W',
+                 'NORTHEAST':'NE','NORTHWEST':'NW','SOUTHEAST':'SE','SOUTHWEST':'SW','CENTRAL':'CEN','NORTH':'N','SOUTH':'S','EAST':'E','WEST':'W',
+                 'VALLEY':'VLY','RIVER':'RVR','LAKE':'LK','ISLAND':'IS','ISLANDS':'IS','HIGHLANDS':'HILANDS','PLAINS':'PLNS','AND':'+','THE':'',
+                 'FOOTHILLS':'FTHLS','COASTAL':'CSTL','COAST':'CST','NATIONAL':'NATL','FOREST':'FST','METROPOLITAN':'METRO','INCLUDING':'INCL',
+                 'NAUTICAL':'NM','MILES':'MI','FROM':'FM','TO':'TO','OUT':'OUT','WATERS':'WTRS','SOUND':'SND','HARBOR':'HBR','POINT':'PT','SAINT':'ST'}
+
+def makeSlot(zone):
+    """Return the direct-address slot (0-1999) for a six-character UGC code such as NMZ201 or NMC001, or None if the code is malformed."""
+    try:
+        kind = zone[2]
+        number = int(zone[3:6])
+        if len(zone) != 6 or kind not in 'ZC':
+            return None
+        return number + (1000 if kind == 'C' else 0)
+    
+    except (IndexError, TypeError, ValueError):
+        return None
+
+def makeAbbrev(name):
+    """Convert a full NWS zone/county name into a 15-character upper-case ZONETEXT string."""
+    words = [ABBREVIATIONS.get(w, w) for w in name.upper().replace('/', ' ').replace(',', ' ').split()]
+    text = ' '.join(w for w in words if w).encode('ascii', 'replace').decode('ascii')
+    return text[:TEXT_LEN].ljust(TEXT_LEN)
+
+def makeCountyAbbrev(name):
+    """Convert a county name into ZONETEXT ending in CTY, as in nm.ZONETEXT ('BERNALILLO CTY '), so county text is never mistaken for zone text.  The name is shortened as needed to keep the suffix."""
+    text = makeAbbrev(name).rstrip()
+    if not text.endswith(' CTY'):
+        text = text[:TEXT_LEN - 4].rstrip() + ' CTY'
+    return text.ljust(TEXT_LEN)
+
+def readDBF(path):
+    """Yield each live record of a dBASE (.dbf) shapefile attribute table as a dict of upper-case field name to stripped string value."""
+    with open(path, 'rb') as f:
+        header = f.read(32)
+        count, header_len, record_len = struct.unpack('<IHH', header[4:12])
+        fields = []
+        while True:
+            desc = f.read(32)
+            if not desc or desc[0] == 0x0D:
+                break
+            fields.append((desc[:11].split(b'\0')[0].decode('ascii').upper(), desc[16]))
+        
+        f.seek(header_len)
+        for n in range(count):
+            record = f.read(record_len)
+            if len(record) < record_len:
+                break
+            if record[:1] == b'*':
+                continue
+            row, pos = {}, 1
+            for name, length in fields:
+                row[name] = record[pos:pos + length].decode('latin-1').strip()
+                pos += length
+            yield row
+
+def readCSV(path):
+    """Yield each row of a CSV export of a zone/county attribute table with upper-case field names."""
+    with open(path, 'r', newline='', encoding='latin-1') as f:
+        for row in csv.DictReader(f):
+            yield {k.strip().upper(): (v or '').strip() for k, v in row.items() if k}
+
+def makeZoneRecord(row):
+    """Convert one attribute-table row to a (UGC, ZONETEXT) pair.  Handles the NWS public/fire zone tables (STATE, ZONE, NAME/SHORTNAME), marine zone tables (ID, NAME), county tables (STATE, FIPS, COUNTYNAME) and plain UGC/ZONETEXT CSV files.  Returns None for rows that cannot be mapped."""
+    if row.get('UGC') and row.get('ZONETEXT'):
+        return row['UGC'].upper(), row['ZONETEXT'][:TEXT_LEN].ljust(TEXT_LEN)
+    if row.get('FIPS') and row.get('COUNTYNAME') and row.get('STATE'):
+        return row['STATE'].upper() + 'C' + row['FIPS'][-3:], makeCountyAbbrev(row['COUNTYNAME'])
+    if row.get('STATE') and row.get('ZONE'):
+        return row['STATE'].upper() + 'Z' + row['ZONE'].zfill(3)[-3:], makeAbbrev(row.get('SHORTNAME') or row.get('NAME', ''))
+    if row.get('ID') and len(row['ID']) == 6:
+        return row['ID'].upper(), makeAbbrev(row.get('NAME', ''))
+    return None
+
+def readSource(source):
+    """Yield (UGC, ZONETEXT) pairs from a data source: a mapping such as nm.ZONETEXT, or the path of a .dbf or .csv attribute table."""
+    if isinstance(source, dict):
+        yield from source.items()
+        return
+    
+    rows = readDBF(source) if source.lower().endswith('.dbf') else readCSV(source)
+    for row in rows:
+        record = makeZoneRecord(row)
+        if record is not None:
+            yield record
+
+def buildIndex(sources, path=INDEX_PATH):
+    """Build the packed zone-text index at path from one or more data sources.  Earlier sources take precedence when the same UGC code appears twice, so list hand-tuned sources (e.g. nm.ZONETEXT) and public zones before fire zones.  Returns the number of codes written."""
+    tables = {}
+    written = 0
+    
+    for source in sources:
+        for zone, text in readSource(source):
+            slot = makeSlot(zone)
+            if slot is None:
+                continue
+            table = tables.setdefault(zone[:2], bytearray(TABLE_LEN))
+            pos = slot * TEXT_LEN
+            if table[pos] == 0:
+                table[pos:pos + TEXT_LEN] = text[:TEXT_LEN].ljust(TEXT_LEN).encode('ascii', 'replace')
+                written += 1
+    
+    states = sorted(tables)
+    offset = len(MAGIC) + 2 + DIRENTRY.size * len(states)
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(MAGIC + struct.pack('<H', len(states)))
+        for n, state in enumerate(states):
+            f.write(DIRENTRY.pack(state.encode('ascii'), offset + n * TABLE_LEN))
+        for state in states:
+            f.write(tables[state])
+    os.replace(tmp, path)
+    return written
+
+#-----CLASSES-----#
+class ZoneRegistry:
+    """Lookup of 15-character ZONETEXT for any UGC zone/county code.  Hand-tuned data sources (nm.ZONETEXT) are consulted first, then the memory-mapped index built by buildIndex().  The index is opened on first use and each state's table is mapped only when a code from that state is first looked up, so startup cost does not grow with the number of states."""
+    
+    def __init__(self, path=INDEX_PATH, sources=(nm.ZONETEXT,)):
+        """Initializes the registry with the index path and the hand-tuned data sources that override it."""
+        self.path = path
+        self.sources = tuple(sources)
+        self.offsets = None
+        self.tables = {}
+        self._mm = None
+    
+    def openIndex(self):
+        """Memory-map the index and read its state directory.  A missing index leaves only the hand-tuned sources available."""
+        self.offsets = {}
+        
+        try:
+            if not os.path.exists(self.path):
+                return
+            with open(self.path, 'rb') as f:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            if self._mm[:len(MAGIC)] != MAGIC:
+                raise ValueError(f'{self.path} is not a zone index')
+            count = struct.unpack_from('<H', self._mm, len(MAGIC))[0]
+            for n in range(count):
+                state, offset = DIRENTRY.unpack_from(self._mm, len(MAGIC) + 2 + n * DIRENTRY.size)
+                self.offsets[state.decode('ascii')] = offset
+        
+        except Exception as ex:
+            print(f'ZoneRegistry Exception: {ex}')
+            self.offsets = {}
+    
+    def getTable(self, state):
+        """Return the memory-mapped ZONETEXT table for a two-letter state/marine prefix, or None if the index has no entries for it."""
+        table = self.tables.get(state)
+        if table is None:
+            if self.offsets is None:
+                self.openIndex()
+            offset = self.offsets.get(state)
+            if offset is None:
+                return None
+            table = self.tables[state] = memoryview(self._mm)[offset:offset + TABLE_LEN]
+        return table
+    
+    def makeZoneText(self, zone, default=None):
+        """Return the 15-character ZONETEXT for a UGC code.  Unknown codes return default, or the code itself padded to 15 characters if no default is given."""
+        for source in self.sources:
+            text = source.get(zone)
+            if text is not None:
+                return text
+        
+        slot = makeSlot(zone)
+        table = self.getTable(zone[:2]) if slot is not None else None
+        if table is not None:
+            pos = slot * TEXT_LEN
+            if table[pos] != 0:
+                return bytes(table[pos:pos + TEXT_LEN]).decode('ascii')
+        return default if default is not None else str(zone)[:TEXT_LEN].ljust(TEXT_LEN)
+
+_registry = None
+
+def makeZoneText(zone, default=None):
+    """Convert a UGC zone/county code to its 15-character ZONETEXT using the shared ZoneRegistry."""
+    global _registry
+    
+    if _registry is None:
+        _registry = ZoneRegistry()
+    return _registry.makeZoneText(zone, default)
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3:
+        print('Usage: zones.py <index file> <zone/county .dbf or .csv> [...]')
+        sys.exit(1)
+    n = buildIndex([nm.ZONETEXT] + sys.argv[2:], sys.argv[1])
+    print(f'Wrote {n} zone/county codes to {sys.argv[1]}.')